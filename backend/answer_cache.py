@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Answer Cache – reuse /api/ask answers for repeated questions
+Handles:
+  - Question normalization (case, whitespace, stopwords, Malayalam spelling)
+    that keeps the question words, so "when" and "how" questions stay apart
+  - TTL + LRU bounded cache keyed on question, language and knowledge version
+  - Semantic lookup: paraphrased questions reuse an answer when their hashed
+    word + character n-gram vectors are similar enough
+  - Automatic invalidation when a new knowledge base version is published
+  - Hit / miss counters for the health endpoints
+"""
+
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Callable
+import math
+import re
+import threading
+import time
+import zlib
+
+from knowledge_index import STOPWORDS, TOKEN_PATTERN, normalize_malayalam
+
+
+# Farmer vocabulary mapped onto the word the rest of the corpus uses, so
+# paraphrases land on the same vector dimensions
+QUESTION_SYNONYMS = {
+    'paddy': 'rice', 'നെല്ല്': 'rice', 'അരി': 'rice',
+    'dose': 'quantity', 'dosage': 'quantity', 'amount': 'quantity', 'rate': 'quantity',
+    'fertiliser': 'fertilizer', 'fertilizers': 'fertilizer', 'manures': 'manure',
+    'pests': 'pest', 'diseases': 'disease', 'insects': 'pest', 'insect': 'pest',
+    'apply': 'application', 'applying': 'application',
+    'grow': 'cultivation', 'growing': 'cultivation', 'cultivate': 'cultivation', 'planting': 'cultivation',
+    'coconuts': 'coconut', 'തെങ്ങ്': 'coconut',
+    'watering': 'irrigation', 'water': 'irrigation',
+}
+
+# Question phrases made only of stopwords that still carry the intent
+QUESTION_PHRASES = re.compile(r'\bhow (?:much|many)\b')
+
+# Interrogatives the index drops as stopwords but that decide which answer a
+# question wants ("when to apply" vs "how to apply")
+QUESTION_WORDS = frozenset({
+    'what', 'which', 'how', 'when', 'where', 'why', 'who',
+    'എന്ത്', 'എങ്ങനെ', 'എപ്പോൾ', 'എവിടെ', 'എത്ര',
+})
+QUESTION_STOPWORDS = STOPWORDS - QUESTION_WORDS
+
+# Auxiliaries opening a yes/no question ("Is it safe ...", "Can I ..."); they
+# all become one marker word, so yes/no and how-to questions stay apart
+YES_NO_OPENERS = frozenset({'is', 'are', 'can', 'should', 'do', 'does', 'will', 'was', 'has', 'have'})
+YES_NO_MARKER = 'whether'
+
+# Size of the hashed vector space; collisions are rare for question-sized text
+VECTOR_DIMENSIONS = 1 << 20
+CHAR_NGRAM = 3
+CHAR_NGRAM_WEIGHT = 0.5
+
+# Paraphrased questions at or above this cosine similarity reuse a cached answer
+SIMILARITY_THRESHOLD = 0.8
+
+
+def normalize_question(question: str) -> str:
+    """Canonical form of a question: normalized Malayalam, lowercase, question words kept, no other stopwords"""
+    words = TOKEN_PATTERN.findall(QUESTION_PHRASES.sub(' quantity ', normalize_malayalam(question).lower()))
+    kept = [word for word in words if word not in QUESTION_STOPWORDS]
+    if words and words[0] in YES_NO_OPENERS:
+        kept.insert(0, YES_NO_MARKER)
+    return ' '.join(kept)
+
+
+def _bucket(feature: str) -> int:
+    # crc32 rather than hash(): stable across processes and restarts
+    return zlib.crc32(feature.encode('utf-8')) % VECTOR_DIMENSIONS
+
+
+def question_vector(normalized_question: str,
+                    term_weight: Optional[Callable[[str], float]] = None) -> Dict[int, float]:
+    """
+    Unit-length sparse vector of a normalized question: hashed words (after
+    synonym mapping, question words included) plus down-weighted character
+    trigrams, which absorb plurals and small spelling differences.
+
+    :param term_weight: optional word weight, normally the knowledge index
+        idf, so specific terms ("urea", "potash") outweigh generic ones ("rice")
+    """
+    vector: Dict[int, float] = {}
+    for word in normalized_question.split():
+        word = QUESTION_SYNONYMS.get(word, word)
+        weight = term_weight(word) if term_weight else 1.0
+        index = _bucket('w:' + word)
+        vector[index] = vector.get(index, 0.0) + weight
+        padded = f'#{word}#'
+        for i in range(max(1, len(padded) - CHAR_NGRAM + 1)):
+            index = _bucket('c:' + padded[i:i + CHAR_NGRAM])
+            vector[index] = vector.get(index, 0.0) + weight * CHAR_NGRAM_WEIGHT
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {i: v / norm for i, v in vector.items()} if norm else {}
+
+
+def cosine_similarity(a: Dict[int, float], b: Dict[int, float]) -> float:
+    """Cosine of two unit-length sparse vectors"""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(i, 0.0) for i, v in a.items())
+
+
+def language_key(language: str) -> str:
+    """Primary language subtag, so 'ml-IN' and 'ml' share answers"""
+    return (language or 'en').split('-')[0].lower()
+
+
+class AnswerCache:
+    """
+    Thread-safe TTL/LRU cache of generated answers.
+
+    Lookups try the exact normalized question first. With a similarity
+    threshold set, a miss then falls back to the most similar cached
+    question of the same language and reuses its answer when the cosine
+    similarity reaches the threshold.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 6 * 3600,
+                 similarity_threshold: Optional[float] = None):
+        """
+        :param max_entries: least recently used answers are evicted beyond this
+        :param ttl_seconds: answers older than this are treated as misses
+        :param similarity_threshold: minimum cosine similarity for a semantic
+            hit (0-1); None disables semantic lookup
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: 'OrderedDict[Tuple[str, str], Tuple[float, str, Dict[int, float]]]' = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _check_version(self, version: int) -> bool:
+        """
+        Drop every answer once a newer knowledge base version shows up.
+        False for an older version: a request still running on a replaced
+        snapshot must not read or clear the current answers.
+        """
+        if self._version is not None and version < self._version:
+            return False
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+        return True
+
+    def get(self, question: str, language: str, version: int, index=None) -> Optional[str]:
+        """
+        Cached answer for the question, or None.
+        :param index: KnowledgeIndex of that version; its idf weights the semantic lookup
+        """
+        key = (normalize_question(question), language_key(language))
+        now = time.monotonic()
+        with self._lock:
+            if not self._check_version(version):
+                self.misses += 1
+                return None
+            item = self._entries.get(key)
+            if item is not None and now - item[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._entries[key]
+            similar_key = self._most_similar(key, now, index) if self.similarity_threshold is not None else None
+            if similar_key is not None:
+                self._entries.move_to_end(similar_key)
+                self.semantic_hits += 1
+                return self._entries[similar_key][1]
+            self.misses += 1
+            return None
+
+    def _most_similar(self, key: Tuple[str, str], now: float, index=None) -> Optional[Tuple[str, str]]:
+        """Key of the most similar live cached question above the threshold. Caller holds the lock."""
+        if not key[0]:
+            return None
+        vector = question_vector(key[0], index.idf if index is not None else None)
+        best_key, best_similarity = None, self.similarity_threshold
+        for cached_key, (created, _, cached_vector) in self._entries.items():
+            if cached_key[1] != key[1] or now - created > self.ttl_seconds:
+                continue
+            similarity = cosine_similarity(vector, cached_vector)
+            if similarity >= best_similarity:
+                best_key, best_similarity = cached_key, similarity
+        return best_key
+
+    def put(self, question: str, language: str, version: int, answer: str, index=None) -> None:
+        """Remember an answer generated against the given knowledge base version (and its index)"""
+        key = (normalize_question(question), language_key(language))
+        if not key[0]:
+            return
+        with self._lock:
+            if not self._check_version(version):
+                return
+            self._entries[key] = (time.monotonic(), answer,
+                                 question_vector(key[0], index.idf if index is not None else None))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                'hits': self.hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+                'similarity_threshold': self.similarity_threshold,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'knowledge_version': self._version
+            }
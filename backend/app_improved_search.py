@@ -6,13 +6,14 @@ Better search algorithm and response processing
 
 import os
 import logging
-import re
 from datetime import datetime
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 
 # Import our enhanced processor
 from pdf_processor import AgriculturalDocumentProcessor
+from knowledge_store import KnowledgeStore
+from extractive_answer import extractive_answer
 
 # -----------------------------
 # Setup logging
@@ -38,105 +39,20 @@ processor = AgriculturalDocumentProcessor(
 )
 
 # Load knowledge base
-knowledge_base = None
+knowledge_store = KnowledgeStore(processor)
 
 def load_knowledge_base():
-    """Load knowledge base from processed PDFs and TXTs"""
-    global knowledge_base
-    try:
-        knowledge_base = processor.load_all_knowledge()
-        total_entries = sum(len(entries) for entries in knowledge_base.values())
-        print(f"✅ Knowledge base loaded: {total_entries} entries")
-    except Exception as e:
-        print(f"❌ Error loading knowledge base: {str(e)}")
-        knowledge_base = {}
-
-def find_most_relevant_content(question: str, search_results: list) -> str:
-    """Find the most relevant content from search results"""
-    
-    if not search_results:
-        return ""
-    
-    question_lower = question.lower()
-    question_words = set(re.findall(r'\b\w+\b', question_lower))
-    
-    best_content = ""
-    best_score = 0
-    
-    for result in search_results:
-        content = result.get('content', '')
-        content_lower = content.lower()
-        
-        # Calculate relevance score
-        score = 0
-        
-        # Exact phrase match gets highest score
-        if question_lower in content_lower:
-            score += 10
-        
-        # Word overlap score
-        content_words = set(re.findall(r'\b\w+\b', content_lower))
-        word_overlap = len(question_words & content_words)
-        score += word_overlap * 2
-        
-        # Length bonus for longer, more detailed content
-        if len(content) > 200:
-            score += 1
-        
-        # Check for agricultural keywords
-        agri_keywords = ['cultivation', 'farming', 'crop', 'pest', 'disease', 'irrigation', 'fertilizer', 'soil', 'harvest']
-        for keyword in agri_keywords:
-            if keyword in content_lower:
-                score += 1
-        
-        if score > best_score:
-            best_score = score
-            best_content = content
-    
-    return best_content
-
-def process_response_content(content: str, question: str) -> str:
-    """Process the content to make it more relevant to the question"""
-    
-    if not content:
-        return ""
-    
-    # Extract sentences that are most relevant to the question
-    sentences = re.split(r'[.!?]+', content)
-    question_words = set(re.findall(r'\b\w+\b', question.lower()))
-    
-    relevant_sentences = []
-    
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if len(sentence) < 20:  # Skip very short sentences
-            continue
-            
-        sentence_lower = sentence.lower()
-        
-        # Check if sentence contains question words
-        if any(word in sentence_lower for word in question_words):
-            relevant_sentences.append(sentence)
-        # Also include sentences with agricultural keywords
-        elif any(keyword in sentence_lower for keyword in ['cultivation', 'farming', 'crop', 'pest', 'disease', 'irrigation', 'fertilizer', 'soil', 'harvest']):
-            relevant_sentences.append(sentence)
-    
-    # If we found relevant sentences, use them
-    if relevant_sentences:
-        # Take the first 3 most relevant sentences
-        answer = '. '.join(relevant_sentences[:3])
-        if not answer.endswith('.'):
-            answer += '.'
-        return answer
-    
-    # Fallback: use the first part of the content
-    return content[:300] + "..." if len(content) > 300 else content
+    """Load knowledge base from processed PDFs and TXTs (swapped in once fully built)"""
+    knowledge_base = knowledge_store.reload()
+    total_entries = knowledge_base.entry_count()
+    print(f"✅ Knowledge base loaded: {total_entries} entries")
 
 def get_improved_agricultural_advice(question: str, language: str) -> str:
     """Get agricultural advice using improved search and processing"""
     
     # Detect Malayalam
     is_malayalam = language.startswith('ml') or language == 'ml-IN'
+    knowledge_base = knowledge_store.current()
     
     # Search knowledge base
     if not knowledge_base:
@@ -146,26 +62,18 @@ def get_improved_agricultural_advice(question: str, language: str) -> str:
             return "Sorry, knowledge base could not be loaded."
     
     try:
-        search_results = processor.search_knowledge(question, knowledge_base)
-        logger.info(f"Found {len(search_results)} search results")
+        # Best sentences straight from the index's precomputed sentence table
+        processed_content = extractive_answer(knowledge_base.index, question, language)
+        logger.info(f"Extractive answer: {processed_content[:100]}...")
         
-        if search_results:
-            # Find the most relevant content
-            relevant_content = find_most_relevant_content(question, search_results)
-            logger.info(f"Most relevant content: {relevant_content[:100]}...")
+        if processed_content:
+            # Add a helpful prefix
+            if is_malayalam:
+                answer = f"ഞങ്ങളുടെ കൃഷി അറിവ് ശേഖരത്തിൽ നിന്ന്: {processed_content}"
+            else:
+                answer = f"Based on our agricultural knowledge base: {processed_content}"
             
-            if relevant_content:
-                # Process the content to make it more relevant
-                processed_content = process_response_content(relevant_content, question)
-                
-                if processed_content:
-                    # Add a helpful prefix
-                    if is_malayalam:
-                        answer = f"ഞങ്ങളുടെ കൃഷി അറിവ് ശേഖരത്തിൽ നിന്ന്: {processed_content}"
-                    else:
-                        answer = f"Based on our agricultural knowledge base: {processed_content}"
-                    
-                    return answer
+            return answer
         
         # No relevant content found
         if is_malayalam:
@@ -190,7 +98,8 @@ load_knowledge_base()
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    total_entries = sum(len(entries) for entries in knowledge_base.values()) if knowledge_base else 0
+    knowledge_base = knowledge_store.current()
+    total_entries = knowledge_base.entry_count() if knowledge_base else 0
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
@@ -233,23 +142,24 @@ def search_knowledge():
     if not query:
         return jsonify({"error": "Missing search query ?q="}), 400
     
-    if not knowledge_base:
-        load_knowledge_base()
+    knowledge_base = knowledge_store.ensure_loaded()
     
-    results = processor.search_knowledge(query, knowledge_base)
+    # results_count counts every match, not only the 10 returned
+    results, results_count = processor.search_knowledge_counted(query, knowledge_base, top_k=10)
     
     return jsonify({
         "query": query,
-        "results_count": len(results),
-        "results": results[:10]
+        "results_count": results_count,
+        "results": results
     })
 
 @app.route('/')
 def index():
+    knowledge_base = knowledge_store.current()
     return jsonify({
         "status": "AgriAssist Improved Search Backend",
         "ai_ready": False,
-        "total_entries": sum(len(entries) for entries in knowledge_base.values()) if knowledge_base else 0
+        "total_entries": knowledge_base.entry_count() if knowledge_base else 0
     })
 
 # -----------------------------
@@ -12,6 +12,8 @@ from flask_cors import CORS
 
 # Import our enhanced processor
 from pdf_processor import AgriculturalDocumentProcessor
+from knowledge_store import KnowledgeStore
+from extractive_answer import extractive_answer
 
 # -----------------------------
 # Setup logging
@@ -37,66 +39,34 @@ processor = AgriculturalDocumentProcessor(
 )
 
 # Load knowledge base
-knowledge_base = None
+knowledge_store = KnowledgeStore(processor)
 
 def load_knowledge_base():
-    """Load knowledge base from processed PDFs and TXTs"""
-    global knowledge_base
-    try:
-        knowledge_base = processor.load_all_knowledge()
-        total_entries = sum(len(entries) for entries in knowledge_base.values())
-        print(f"✅ Knowledge base loaded: {total_entries} entries")
-    except Exception as e:
-        print(f"❌ Error loading knowledge base: {str(e)}")
-        knowledge_base = {}
+    """Load knowledge base from processed PDFs and TXTs (swapped in once fully built)"""
+    knowledge_base = knowledge_store.reload()
+    total_entries = knowledge_base.entry_count()
+    print(f"✅ Knowledge base loaded: {total_entries} entries")
 
 def get_knowledge_based_advice(question: str, language: str) -> str:
     """Get agricultural advice using only knowledge base"""
     
     # Detect Malayalam
     is_malayalam = language.startswith('ml') or language == 'ml-IN'
+    knowledge_base = knowledge_store.current()
     
-    # Search knowledge base
-    context = ""
+    # Best sentences straight from the index's precomputed sentence table
+    answer = ""
     if knowledge_base:
         try:
-            search_results = processor.search_knowledge(question, knowledge_base)
-            if search_results:
-                # Use top 3 results with highest relevance scores
-                combined_info = [result['content'] for result in search_results[:3]]
-                if combined_info:
-                    context = " ".join(combined_info)
-                    logger.info(f"Found relevant context: {context[:100]}...")
-                else:
-                    logger.warning("No relevant context found in knowledge base")
+            answer = extractive_answer(knowledge_base.index, question, language)
+            if answer:
+                logger.info(f"Found relevant sentences: {answer[:100]}...")
             else:
-                logger.warning("No search results found")
+                logger.warning("No relevant sentences found in knowledge base")
         except Exception as e:
             logger.error(f"Error searching knowledge base: {str(e)}")
     
-    # Process the context to give a better response
-    if context:
-        # Extract the most relevant sentences
-        sentences = context.split('. ')
-        relevant_sentences = []
-        
-        # Look for sentences that contain keywords from the question
-        question_words = question.lower().split()
-        
-        for sentence in sentences:
-            if any(word in sentence.lower() for word in question_words):
-                relevant_sentences.append(sentence)
-        
-        # If we found relevant sentences, use them
-        if relevant_sentences:
-            # Take the first 3 relevant sentences
-            answer = '. '.join(relevant_sentences[:3])
-            if not answer.endswith('.'):
-                answer += '.'
-        else:
-            # Use the first part of the context
-            answer = context[:300] + "..." if len(context) > 300 else context
-        
+    if answer:
         # Add a helpful prefix
         if is_malayalam:
             answer = f"ഞങ്ങളുടെ കൃഷി അറിവ് ശേഖരത്തിൽ നിന്ന്: {answer}"
@@ -121,7 +91,8 @@ load_knowledge_base()
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    total_entries = sum(len(entries) for entries in knowledge_base.values()) if knowledge_base else 0
+    knowledge_base = knowledge_store.current()
+    total_entries = knowledge_base.entry_count() if knowledge_base else 0
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
@@ -164,23 +135,24 @@ def search_knowledge():
     if not query:
         return jsonify({"error": "Missing search query ?q="}), 400
     
-    if not knowledge_base:
-        load_knowledge_base()
+    knowledge_base = knowledge_store.ensure_loaded()
     
-    results = processor.search_knowledge(query, knowledge_base)
+    # results_count counts every match, not only the 10 returned
+    results, results_count = processor.search_knowledge_counted(query, knowledge_base, top_k=10)
     
     return jsonify({
         "query": query,
-        "results_count": len(results),
-        "results": results[:10]  # Limit for performance
+        "results_count": results_count,
+        "results": results
     })
 
 @app.route('/')
 def index():
+    knowledge_base = knowledge_store.current()
     return jsonify({
         "status": "AgriAssist Knowledge Base Only Backend",
         "ai_ready": False,
-        "total_entries": sum(len(entries) for entries in knowledge_base.values()) if knowledge_base else 0
+        "total_entries": knowledge_base.entry_count() if knowledge_base else 0
     })
 
 # -----------------------------
@@ -3,6 +3,7 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 from datetime import datetime
 from pdf_processor import AgriculturalPDFProcessor
+from knowledge_store import KnowledgeStore
 import logging
 
 # -----------------------------
@@ -37,21 +38,16 @@ def after_request(response):
 # PDF processor & knowledge base (NO GEMINI)
 # -----------------------------
 pdf_processor = AgriculturalPDFProcessor("knowledge_base")
-knowledge_base = None
+knowledge_store = KnowledgeStore(pdf_processor)
 
 # -----------------------------
 # Load knowledge base
 # -----------------------------
 def load_knowledge_base():
-    """Load knowledge base from processed PDFs"""
-    global knowledge_base
-    try:
-        knowledge_base = pdf_processor.load_all_knowledge()
-        logger.info("Knowledge base loaded successfully")
-        logger.info(f"Loaded {sum(len(entries) for entries in knowledge_base.values())} total entries")
-    except Exception as e:
-        logger.error(f"Error loading knowledge base: {str(e)}")
-        knowledge_base = {}
+    """Load knowledge base from processed PDFs (swapped in once fully built)"""
+    knowledge_base = knowledge_store.reload()
+    logger.info("Knowledge base loaded successfully")
+    logger.info(f"Loaded {knowledge_base.entry_count()} total entries")
 
 # -----------------------------
 # Simple agricultural advice using knowledge base only
@@ -59,35 +55,22 @@ def load_knowledge_base():
 def get_simple_agricultural_advice(question: str, language: str) -> str:
     """Get agricultural advice using knowledge base only (no Gemini)"""
     is_malayalam = language.startswith('ml') or language == 'ml-IN'
+    knowledge_base = knowledge_store.current()
     context = ""
     
     if knowledge_base:
         try:
-            search_results = pdf_processor.search_knowledge(question, knowledge_base)
-            logger.info(f"Found {len(search_results)} search results for: {question}")
+            # Routed to the index partition of the question's language
+            search_results = pdf_processor.search_knowledge(question, knowledge_base, top_k=3, language=language)
+            logger.info(f"Found {len(search_results)} search results in the question's script for: {question}")
+            if not search_results:
+                # Nothing in that script: the best match in any script beats no answer
+                search_results = pdf_processor.search_knowledge(question, knowledge_base, top_k=1)
             
             if search_results:
-                # Filter results by language preference
-                filtered_results = []
-                for result in search_results[:5]:
-                    content = result['content']
-                    has_malayalam_chars = any('\u0D00' <= char <= '\u0D7F' for char in content)
-                    has_english_chars = any('a' <= char.lower() <= 'z' for char in content)
-                    
-                    if is_malayalam and has_malayalam_chars:
-                        filtered_results.append(result)
-                    elif not is_malayalam and has_english_chars:
-                        english_ratio = sum(1 for char in content if 'a' <= char.lower() <= 'z') / len(content) if content else 0
-                        if english_ratio > 0.3:
-                            filtered_results.append(result)
-                    elif not filtered_results:
-                        filtered_results.append(result)
-                
-                logger.info(f"Filtered to {len(filtered_results)} results")
-                if filtered_results:
-                    combined_info = [result['content'] for result in filtered_results[:3]]
-                    context = " ".join(combined_info)
-                    logger.info(f"Context length: {len(context)} characters")
+                combined_info = [result['content'] for result in search_results[:3]]
+                context = " ".join(combined_info)
+                logger.info(f"Context length: {len(context)} characters")
         except Exception as e:
             logger.error(f"Error searching knowledge base: {str(e)}")
     
@@ -134,16 +117,15 @@ def ask_question():
 @app.route('/api/knowledge-stats', methods=['GET'])
 def get_knowledge_stats():
     try:
-        if not knowledge_base:
-            load_knowledge_base()
+        knowledge_base = knowledge_store.ensure_loaded()
         
         stats = {}
-        total_entries = 0
         for section, entries in knowledge_base.items():
             stats[section] = len(entries)
-            total_entries += len(entries)
         
-        stats['total_entries'] = total_entries
+        # A passage belonging to several sections is counted under each of them,
+        # so the total is the number of distinct passages, not the sum
+        stats['total_entries'] = knowledge_base.entry_count()
         stats['sections'] = list(knowledge_base.keys())
         
         return jsonify({'success': True, 'stats': stats})
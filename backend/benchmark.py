@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+AgriAssist Benchmark – retrieval and answer latency over the bundled corpus
+Handles:
+  - Loading a temporary copy of the real knowledge_base/ (cold, segment-cached
+    and snapshot loads timed), so deployed snapshots and caches are untouched
+  - Replaying benchmark_queries.json (English + Malayalam, short + long)
+    through search_knowledge, extractive_answer and Flask /api/ask with the
+    LLM replaced by a local stub server
+  - p50 / p95 / p99 latency, throughput and RSS growth per scenario, plus
+    the peak RSS of the whole run
+  - Comparison against a stored baseline to catch regressions
+
+Usage:
+  python benchmark.py                  # run, compare with benchmark_baseline.json
+  python benchmark.py --save-baseline  # run and store the results as the baseline
+  python benchmark.py --skip-ask       # retrieval only, without importing the app
+"""
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from typing import List, Dict, Any, Callable, Optional
+import argparse
+import json
+import logging
+import math
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = Path(__file__).resolve().parent
+QUERIES_FILE = BACKEND_DIR / "benchmark_queries.json"
+BASELINE_FILE = BACKEND_DIR / "benchmark_baseline.json"
+
+# Answer every stub LLM call returns
+STUB_ANSWER = ("Apply the recommended dose in two splits, the first at planting and the second "
+               "a month later. Irrigate lightly after each application. ")
+
+# Latency changes smaller than this are timer noise, whatever their percentage
+MIN_LATENCY_DELTA_MS = 0.5
+
+
+# ---------- MEASUREMENT ----------
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process right now (Linux /proc); the peak so far elsewhere"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return peak_rss_mb()
+    return round(resident_pages * resource.getpagesize() / (1 << 20), 1)
+
+
+def best_of(call: Callable[[], Any], repeats: int = 3) -> float:
+    """Fastest of several timed calls, in seconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return round(min(timings), 3)
+
+
+def replay(call: Callable[[Dict[str, str]], Any],
+           queries: List[Dict[str, str]],
+           rounds: int,
+           before_each: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """
+    Latency summary of calling call(query) for every query, rounds times,
+    after one untimed warm-up round. before_each runs outside the timing.
+    rss_growth_mb is how much the resident set grew over the scenario.
+    """
+    rss_before = current_rss_mb()
+    for query in queries:
+        if before_each:
+            before_each()
+        call(query)
+
+    latencies = []
+    busy = 0.0
+    for _ in range(rounds):
+        for query in queries:
+            if before_each:
+                before_each()
+            start = time.perf_counter()
+            call(query)
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed)
+            busy += elapsed
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'throughput_qps': round(len(latencies) / busy, 1) if busy else 0.0,
+        'rss_growth_mb': round(current_rss_mb() - rss_before, 1)
+    }
+
+
+# ---------- STUB LLM ----------
+def start_stub_llm(delay_seconds: float = 0.0) -> ThreadingHTTPServer:
+    """
+    Local server speaking the llm_gateway http_backend protocol: answers
+    every {"prompt": ...} with {"text": STUB_ANSWER} after delay_seconds.
+    """
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if delay_seconds:
+                time.sleep(delay_seconds)
+            body = json.dumps({'text': STUB_ANSWER}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---------- SCENARIOS ----------
+def run_benchmark(rounds: int = 5, skip_ask: bool = False, llm_delay_ms: float = 0.0) -> Dict[str, Any]:
+    """
+    Time knowledge base loading, then replay the query set through every
+    scenario. Everything runs on a temporary copy of knowledge_base/.
+    """
+    from pdf_processor import AgriculturalDocumentProcessor
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        knowledge_base_dir = str(Path(work_dir) / "knowledge_base")
+        shutil.copytree(BACKEND_DIR / "knowledge_base", knowledge_base_dir,
+                        ignore=shutil.ignore_patterns(AgriculturalDocumentProcessor.SNAPSHOT_FILE,
+                                                      AgriculturalDocumentProcessor.CORPUS_FILE,
+                                                      AgriculturalDocumentProcessor.SEGMENT_CACHE_DIR,
+                                                      "*.tmp"))
+        return _run_scenarios(knowledge_base_dir, rounds, skip_ask, llm_delay_ms)
+
+
+def _run_scenarios(knowledge_base_dir: str, rounds: int, skip_ask: bool, llm_delay_ms: float) -> Dict[str, Any]:
+    from pdf_processor import AgriculturalDocumentProcessor
+    from extractive_answer import extractive_answer
+
+    with open(QUERIES_FILE, 'r', encoding='utf-8') as f:
+        queries = json.load(f)
+
+    processor = AgriculturalDocumentProcessor(knowledge_base_dir)
+
+    def cold_load() -> None:
+        # Every source parsed and indexed: the segment cache points at an empty directory
+        cold = AgriculturalDocumentProcessor(knowledge_base_dir)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold.SEGMENT_CACHE_DIR = cache_dir
+            cold.load_all_knowledge(use_snapshot=False)
+
+    knowledge_base = processor.load_all_knowledge(use_snapshot=False)
+    processor.build_snapshot()
+    load = {
+        'cold_load_s': best_of(cold_load),
+        'cached_load_s': best_of(lambda: processor.load_all_knowledge(use_snapshot=False)),
+        'snapshot_load_s': best_of(processor.load_snapshot),
+        'entries': len(knowledge_base.index.entries)
+    }
+    load['peak_rss_mb'] = peak_rss_mb()
+
+    scenarios = {
+        'search': replay(lambda q: processor.search_knowledge(q['question'], knowledge_base, top_k=3,
+                                                              language=q['language']),
+                         queries, rounds),
+        'extractive': replay(lambda q: extractive_answer(knowledge_base.index, q['question'], q['language']),
+                             queries, rounds)
+    }
+
+    if not skip_ask:
+        server = start_stub_llm(llm_delay_ms / 1000)
+        os.environ['LLM_STUB_URL'] = f"http://127.0.0.1:{server.server_port}/"
+        try:
+            import app as agriassist
+            agriassist.pdf_processor.knowledge_base_dir = Path(knowledge_base_dir)
+            agriassist.load_knowledge_base()
+            client = agriassist.app.test_client()
+
+            def ask(query: Dict[str, str]) -> None:
+                response = client.post('/api/ask', json=query)
+                if response.status_code != 200:
+                    raise RuntimeError(f"/api/ask returned {response.status_code} for {query['question']!r}")
+
+            # Every request reaches the stub LLM; the second pass measures cached answers
+            scenarios['ask'] = replay(ask, queries, rounds, before_each=agriassist.answer_cache.clear)
+            scenarios['ask_cached'] = replay(ask, queries, rounds)
+        finally:
+            server.shutdown()
+
+    return {
+        'queries': len(queries),
+        'rounds': rounds,
+        'load': load,
+        'scenarios': scenarios,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+# ---------- BASELINE ----------
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Regressions against a baseline: a scenario whose p95 latency grew, or
+    whose throughput fell, by more than tolerance (0.2 = 20%), and the same
+    for load times and peak RSS. p95 growth under MIN_LATENCY_DELTA_MS is
+    ignored.
+    """
+    regressions = []
+
+    def check(name: str, value: float, reference: Optional[float],
+              higher_is_worse: bool = True, slack: float = 0.0) -> None:
+        if not reference or abs(value - reference) <= slack:
+            return
+        change = (value - reference) / reference
+        if (change if higher_is_worse else -change) > tolerance:
+            regressions.append(f"{name}: {reference} -> {value} ({change:+.0%})")
+
+    for scenario, summary in results['scenarios'].items():
+        reference = baseline.get('scenarios', {}).get(scenario, {})
+        check(f"{scenario} p95_ms", summary['p95_ms'], reference.get('p95_ms'), slack=MIN_LATENCY_DELTA_MS)
+        check(f"{scenario} throughput_qps", summary['throughput_qps'], reference.get('throughput_qps'),
+              higher_is_worse=False)
+    for key in ('cold_load_s', 'cached_load_s', 'snapshot_load_s'):
+        check(key, results['load'][key], baseline.get('load', {}).get(key))
+    check('peak_rss_mb', results['peak_rss_mb'], baseline.get('peak_rss_mb'))
+    return regressions
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    load = results['load']
+    print(f"📚 {load['entries']} entries | cold load {load['cold_load_s']}s | cached load {load['cached_load_s']}s"
+          f" | snapshot load {load['snapshot_load_s']}s")
+    print(f"🔁 {results['queries']} queries x {results['rounds']} rounds")
+    print(f"{'scenario':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'qps':>10}{'rss +MB':>10}")
+    for scenario, summary in results['scenarios'].items():
+        print(f"{scenario:<12}{summary['p50_ms']:>10}{summary['p95_ms']:>10}{summary['p99_ms']:>10}"
+              f"{summary['throughput_qps']:>10}{summary['rss_growth_mb']:>10}")
+    print(f"Peak RSS: {results['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval and /api/ask over the bundled knowledge base")
+    parser.add_argument('--rounds', type=int, default=5, help="timed passes over the query set per scenario")
+    parser.add_argument('--skip-ask', action='store_true', help="leave out the Flask /api/ask scenarios")
+    parser.add_argument('--llm-delay-ms', type=float, default=0.0, help="latency added by the stub LLM")
+    parser.add_argument('--baseline', default=str(BASELINE_FILE), help="baseline results file")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args()
+
+    # Paths in the processor and the apps are relative to the backend directory
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, str(BACKEND_DIR))
+    logging.disable(logging.INFO)
+
+    results = run_benchmark(args.rounds, args.skip_ask, args.llm_delay_ms)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+        return
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; run with --save-baseline to create one")
+        return
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print("❌ Regressions against baseline:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        sys.exit(1)
+    print("✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Corpus Store – read-only, memory-mapped passage text
+Handles:
+  - Writing passage texts into one UTF-8 corpus file, addressed by byte span
+  - Mapping that file read-only, so every worker process on a machine
+    shares a single page-cached copy instead of holding its own strings
+  - Knowledge entries whose 'content' is decoded only when it is read
+"""
+
+from pathlib import Path
+from typing import List, Tuple, Iterable, Any
+import mmap
+import os
+
+
+class MappedCorpus:
+    """Passage texts of a corpus file, decoded from a read-only memory map on demand"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self.size = os.fstat(f.fileno()).st_size
+            # An empty file cannot be mapped; there is nothing to read then anyway
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+
+    def text(self, start: int, length: int) -> str:
+        """Decode the passage stored at [start, start + length)"""
+        return self._map[start:start + length].decode('utf-8')
+
+    @staticmethod
+    def write(path: str, texts: Iterable[str]) -> List[Tuple[int, int]]:
+        """
+        Write texts back to back into a new corpus file (atomically replacing
+        any existing one) and return the (start, length) byte span of each.
+        """
+        path = Path(path)
+        tmp_path = path.with_suffix('.tmp')
+        spans = []
+        offset = 0
+        with open(tmp_path, 'wb') as f:
+            for text in texts:
+                data = text.encode('utf-8')
+                f.write(data)
+                spans.append((offset, len(data)))
+                offset += len(data)
+        os.replace(tmp_path, path)
+        return spans
+
+
+class CorpusEntry(dict):
+    """
+    Knowledge entry backed by a mapped corpus: every key except 'content'
+    is stored normally, 'content' is decoded from the map each time it is
+    read and never kept on the entry.
+    """
+
+    __slots__ = ('corpus', 'span')
+
+    def __init__(self, corpus: MappedCorpus, span: Tuple[int, int], *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.corpus = corpus
+        self.span = span
+
+    def __missing__(self, key: str) -> Any:
+        if key == 'content':
+            return self.corpus.text(*self.span)
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == 'content' and not dict.__contains__(self, key):
+            return self.corpus.text(*self.span)
+        return super().get(key, default)
+
+    def __contains__(self, key: object) -> bool:
+        return key == 'content' or super().__contains__(key)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Extractive Answer – answers built from knowledge base text alone
+Handles:
+  - Scoring the precomputed sentence table of the index (BM25 per sentence,
+    idf from the question's language partition)
+  - Dropping sentences that repeat an already chosen one
+  - Serving as the answer in no-LLM mode and whenever the model is unavailable
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+import heapq
+
+from knowledge_index import SentenceTable, tokenize, partition_of
+
+# Sentences in an answer, and how many top-scoring candidates are considered
+ANSWER_SENTENCES = 3
+CANDIDATE_POOL = 12
+
+# Postings read per term and source: the highest-impact sentences of a
+# common term are all that can reach the top of an answer
+POSTINGS_LIMIT = 48
+
+# Token-set Jaccard similarity above which a sentence repeats a chosen one
+REDUNDANCY_THRESHOLD = 0.5
+
+
+def top_sentences(index, question: str, language: Optional[str] = None,
+                  max_sentences: int = ANSWER_SENTENCES) -> List[Dict[str, Any]]:
+    """
+    Best non-redundant sentences for a question, best first, as
+    {'text', 'section', 'source', 'score'} dicts.
+    :param index: KnowledgeIndex (with sentence tables)
+    :param language: request language; only sentences of its partition compete
+    """
+    query_terms = set(tokenize(question))
+    if index is None or not query_terms or not index.sentence_count:
+        return []
+    view = index.view(language)
+    partition = partition_of(language)
+    mask = SentenceTable.PARTITION_FLAGS[partition] if partition else 0
+    k1_plus_1 = index.K1 + 1
+    idf = {term: view.idf(term) * k1_plus_1 for term in query_terms}
+
+    scores: Dict[Tuple[int, int], float] = {}
+    for position, segment in enumerate(index.segments):
+        table = segment.sentences
+        norms = index.sentence_norms[position]
+        flags = table.partitions
+        local: Dict[int, float] = {}
+        for term, weight in idf.items():
+            for sentence_id, tf in table.iter_postings(term, POSTINGS_LIMIT):
+                if mask and not flags[sentence_id] & mask:
+                    continue
+                local[sentence_id] = local.get(sentence_id, 0.0) + weight * tf / (tf + norms[sentence_id])
+        for sentence_id, score in local.items():
+            scores[(position, sentence_id)] = score
+
+    # Highest score first, ties in index order
+    candidates = heapq.nlargest(CANDIDATE_POOL, scores.items(),
+                                key=lambda item: (item[1], -item[0][0], -item[0][1]))
+    chosen: List[Dict[str, Any]] = []
+    chosen_tokens: List[set] = []
+    for (position, sentence_id), score in candidates:
+        segment = index.segments[position]
+        table = segment.sentences
+        section, entry = segment.entries[table.entry_ids[sentence_id]]
+        text = entry['content'][table.starts[sentence_id]:table.ends[sentence_id]]
+        tokens = set(tokenize(text))
+        if any(len(tokens & other) / len(tokens | other) > REDUNDANCY_THRESHOLD for other in chosen_tokens):
+            continue
+        chosen.append({'text': text, 'section': section, 'source': segment.source, 'score': round(score, 3)})
+        chosen_tokens.append(tokens)
+        if len(chosen) == max_sentences:
+            break
+    return chosen
+
+
+def extractive_answer(index, question: str, language: Optional[str] = None,
+                      max_sentences: int = ANSWER_SENTENCES) -> str:
+    """
+    Answer made of the top sentences for a question ("" if nothing matches).
+    Falls back to sentences in any language when the question's own
+    language partition has no match.
+    """
+    sentences = top_sentences(index, question, language, max_sentences)
+    if not sentences and language:
+        sentences = top_sentences(index, question, None, max_sentences)
+    answer = ' '.join(sentence['text'] for sentence in sentences)
+    if answer and not answer.endswith(('.', '!', '?')):
+        answer += '.'
+    return answer
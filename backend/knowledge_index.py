@@ -0,0 +1,586 @@
+#!/usr/bin/env python3
+"""
+Knowledge Index – prebuilt lookup structures for the knowledge base
+Handles:
+  - Tokenization shared by indexing and querying (English + Malayalam,
+    with chillu / ZWJ / ZWNJ spellings normalized)
+  - Token -> posting-list inverted index, one segment per source document
+  - BM25F ranking with entry content and section as fields
+  - Script composition (Malayalam / Latin / digit ratios) of every entry
+  - Per-language partitions (Malayalam, English) with their own term
+    statistics, so a query only competes against entries in its language
+  - A sentence table per source (offsets, lengths, language, postings)
+    that extractive answers are selected from without re-splitting text
+  - KnowledgeBase: the familiar section -> entries dict, carrying its index
+"""
+
+from array import array
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Iterator
+import logging
+import math
+import re
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Word characters plus the Malayalam block (vowel signs and virama are not \w)
+# and the zero-width joiners used in chillu sequences.
+TOKEN_PATTERN = re.compile(r'[\w\u0D00-\u0D7F\u200c\u200d]+')
+
+# One sentence, including its closing punctuation
+SENTENCE_SPAN = re.compile(r'[^.!?]+[.!?]*')
+
+# Sentences shorter than this (headings, list numbers) or longer than this
+# (flattened tables without punctuation) are never answers
+SENTENCE_MIN_CHARS = 20
+SENTENCE_MAX_CHARS = 400
+
+# Function words that would otherwise pull most of the corpus into every query
+STOPWORDS = frozenset({
+    'a', 'an', 'the', 'and', 'or', 'of', 'to', 'in', 'on', 'for', 'with',
+    'is', 'are', 'was', 'be', 'by', 'at', 'as', 'it', 'its', 'this', 'that',
+    'from', 'what', 'which', 'how', 'when', 'where', 'why', 'who', 'do',
+    'does', 'can', 'should', 'i', 'my', 'me', 'we', 'our', 'you', 'your',
+    'much', 'many', 'about', 'into', 'there', 'their', 'has', 'have', 'will',
+    # Malayalam question and function words
+    'ഒരു', 'ഈ', 'ആ', 'ഇത്', 'അത്', 'എന്ത്', 'എങ്ങനെ', 'എപ്പോൾ', 'എവിടെ',
+    'എത്ര', 'ആണ്', 'ഉണ്ട്', 'എന്ന', 'എന്നാൽ', 'വേണ്ടി', 'കൊണ്ട്',
+})
+
+
+# Chillu letters written the old way (consonant + virama + ZWJ) and their
+# atomic Unicode 5.1 code points, so both spellings compare equal
+CHILLU_SEQUENCES = {
+    '\u0D23\u0D4D\u200D': '\u0D7A',  # ൺ
+    '\u0D28\u0D4D\u200D': '\u0D7B',  # ൻ
+    '\u0D30\u0D4D\u200D': '\u0D7C',  # ർ
+    '\u0D32\u0D4D\u200D': '\u0D7D',  # ൽ
+    '\u0D33\u0D4D\u200D': '\u0D7E',  # ൾ
+    '\u0D15\u0D4D\u200D': '\u0D7F',  # ൿ
+}
+CHILLU_PATTERN = re.compile('|'.join(CHILLU_SEQUENCES))
+JOINER_PATTERN = re.compile('[\u200C\u200D]')
+
+
+def normalize_malayalam(text: str) -> str:
+    """NFC, atomic chillu letters and no leftover zero-width (non-)joiners"""
+    text = unicodedata.normalize('NFC', text)
+    text = CHILLU_PATTERN.sub(lambda m: CHILLU_SEQUENCES[m.group(0)], text)
+    return JOINER_PATTERN.sub('', text)
+
+
+# Character classes behind the per-entry script statistics
+MALAYALAM_CHARS = re.compile('[\u0D00-\u0D7F]')
+LATIN_CHARS = re.compile('[A-Za-z]')
+DIGIT_CHARS = re.compile('[0-9]')
+
+# A Latin-script (English) entry needs more than this share of Latin letters
+LATIN_MIN_RATIO = 0.3
+
+# Language partitions of the index: Malayalam and English (Latin script)
+LANGUAGE_PARTITIONS = ('ml', 'en')
+
+
+def script_stats(text: str) -> Tuple[float, float, float]:
+    """(Malayalam, Latin, digit) character ratios of a text"""
+    if not text:
+        return 0.0, 0.0, 0.0
+    length = len(text)
+    return (len(MALAYALAM_CHARS.findall(text)) / length,
+            len(LATIN_CHARS.findall(text)) / length,
+            len(DIGIT_CHARS.findall(text)) / length)
+
+
+def _ratio_byte(ratio: float) -> int:
+    """Ratio stored as 0-255 in one byte; any nonzero ratio stays nonzero"""
+    return max(1, round(ratio * 255)) if ratio > 0 else 0
+
+
+def entry_partitions(malayalam: int, latin: int) -> Tuple[str, ...]:
+    """
+    Partitions of an entry from its ratio bytes: any Malayalam text puts it
+    in 'ml', more than LATIN_MIN_RATIO Latin letters in 'en'. Mixed entries
+    are in both; entries in neither (tables of numbers) only in the full index.
+    """
+    partitions = ()
+    if malayalam > 0:
+        partitions += ('ml',)
+    if latin > LATIN_MIN_RATIO * 255:
+        partitions += ('en',)
+    return partitions
+
+
+def partition_of(language: Optional[str]) -> Optional[str]:
+    """Partition a request language code is routed to; None for the full index"""
+    if not language:
+        return None
+    return 'ml' if language.lower().startswith('ml') else 'en'
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens with stopwords removed. Malayalam text is
+    normalized first, so old and atomic chillu spellings (and words typed
+    with or without zero-width joiners) produce the same token.
+    """
+    if MALAYALAM_CHARS.search(text):
+        text = normalize_malayalam(text)
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def term_counts(tokens: Iterable[str]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    return counts
+
+
+def section_fields(sections: Iterable[str],
+                   section_keywords: Optional[Dict[str, List[str]]] = None) -> Dict[str, Dict[str, int]]:
+    """Term counts of each section field: the section name plus its keywords"""
+    section_keywords = section_keywords or {}
+    return {
+        section: term_counts(tokenize(section.replace('_', ' ') + ' ' + ' '.join(section_keywords.get(section, []))))
+        for section in sections
+    }
+
+
+class KnowledgeBase(dict):
+    """
+    Section -> entries mapping returned by load_all_knowledge.
+    Behaves exactly like the plain dict the apps already use, with the
+    prebuilt index attached so search never has to rescan the corpus.
+    """
+
+    def __init__(self, sections: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        super().__init__(sections or {})
+        self.index: Optional['KnowledgeIndex'] = None
+        self.version = 0
+
+    @classmethod
+    def from_index(cls, index: 'KnowledgeIndex') -> 'KnowledgeBase':
+        """
+        Section view over every entry of an index. An entry tagged with
+        several sections is listed under each of them by reference; the
+        index itself holds it once, under its primary section.
+        """
+        knowledge_base = cls({section: [] for section in index.section_terms})
+        for section, entry in index.entries:
+            for tag in entry.get('sections') or (section,):
+                knowledge_base.setdefault(tag, []).append(entry)
+        knowledge_base.index = index
+        return knowledge_base
+
+    def entry_count(self) -> int:
+        """Distinct entries; a passage listed under several sections counts once"""
+        if self.index is not None:
+            return len(self.index.entries)
+        return len({id(entry) for entries in self.values() for entry in entries})
+
+
+def _compact_array(values: List[int]) -> array:
+    """Unsigned array using 2-byte items when every value fits"""
+    return array('H' if max(values, default=0) < 1 << 16 else 'I', values)
+
+
+def _flatten_postings(postings: Dict[str, List[Tuple[int, int]]]) -> Tuple[Dict[str, Tuple[int, int]], array, array]:
+    """term -> (start, count) slices into flat id / tf arrays"""
+    slices: Dict[str, Tuple[int, int]] = {}
+    ids: List[int] = []
+    tfs: List[int] = []
+    for term, term_postings in postings.items():
+        slices[term] = (len(ids), len(term_postings))
+        ids.extend(item_id for item_id, _ in term_postings)
+        tfs.extend(tf for _, tf in term_postings)
+    return slices, _compact_array(ids), _compact_array(tfs)
+
+
+def _pack_postings(slices: Dict[str, Tuple[int, int]]) -> Dict[str, Any]:
+    """Postings slices as one string and two arrays, far cheaper to pickle than a dict of tuples"""
+    terms = list(slices)
+    return {
+        'posting_terms': '\x00'.join(terms),
+        'posting_starts': array('I', (slices[t][0] for t in terms)),
+        'posting_counts': array('I', (slices[t][1] for t in terms))
+    }
+
+
+def _unpack_postings(state: Dict[str, Any]) -> Dict[str, Tuple[int, int]]:
+    terms = state.pop('posting_terms')
+    starts, counts = state.pop('posting_starts'), state.pop('posting_counts')
+    return dict(zip(terms.split('\x00'), zip(starts, counts))) if terms else {}
+
+
+class SentenceTable:
+    """
+    Sentences of one source's entries, split and tokenized once at index
+    time: for each sentence its entry, (start, end) offsets within the
+    entry content, token count and language partitions, plus a term ->
+    sentence postings list. The text itself stays in the entries.
+    """
+
+    PARTITION_FLAGS = {'ml': 1, 'en': 2}
+
+    def __init__(self, entries: List[Tuple[str, Dict[str, Any]]]):
+        self.entry_ids = array('I')
+        self.starts = array('I')
+        self.ends = array('I')
+        self.lengths = array('I')
+        self.partitions = array('B')
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for local_id, (_, entry) in enumerate(entries):
+            content = entry['content']
+            for match in SENTENCE_SPAN.finditer(content):
+                sentence = match.group(0).strip()
+                if not SENTENCE_MIN_CHARS <= len(sentence) <= SENTENCE_MAX_CHARS:
+                    continue
+                tokens = tokenize(sentence)
+                if not tokens:
+                    continue
+                start = match.start() + (len(match.group(0)) - len(match.group(0).lstrip()))
+                sentence_id = len(self.entry_ids)
+                self.entry_ids.append(local_id)
+                self.starts.append(start)
+                self.ends.append(start + len(sentence))
+                self.lengths.append(len(tokens))
+                malayalam, latin, _ = script_stats(sentence)
+                self.partitions.append(sum(self.PARTITION_FLAGS[language] for language in
+                                           entry_partitions(_ratio_byte(malayalam), _ratio_byte(latin))))
+                for term, tf in term_counts(tokens).items():
+                    postings.setdefault(term, []).append((sentence_id, tf))
+
+        self.total_length = sum(self.lengths)
+        # Impact order: the sentences a term weighs most in come first, so
+        # readers can stop after the head of a long postings list
+        avg_length = (self.total_length / len(self.lengths)) if self.lengths else 1.0
+        for term_postings in postings.values():
+            term_postings.sort(key=lambda item: -item[1] / (item[1] + self.lengths[item[0]] / avg_length))
+        self.postings, self.sentence_ids, self.tfs = _flatten_postings(postings)
+
+    def __len__(self) -> int:
+        return len(self.entry_ids)
+
+    def iter_postings(self, term: str, limit: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+        """(local sentence id, term frequency) pairs of a term, highest impact first"""
+        start, count = self.postings.get(term, (0, 0))
+        if limit is not None:
+            count = min(count, limit)
+        return zip(self.sentence_ids[start:start + count], self.tfs[start:start + count])
+
+    # ---------- SERIALIZATION ----------
+    def __getstate__(self) -> Dict[str, Any]:
+        state = {k: v for k, v in self.__dict__.items() if k != 'postings'}
+        state.update(_pack_postings(self.postings))
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        postings = _unpack_postings(state)
+        self.__dict__.update(state)
+        self.postings = postings
+
+
+class IndexSegment:
+    """
+    Postings and term statistics of one source document.
+    Segments are never modified after construction, so replacing a source
+    only means building its segment and swapping it into a new index.
+
+    Postings are stored flat: each term maps to a (start, count) slice of
+    the doc_ids / tfs arrays, which keeps segments compact in memory and
+    cheap to serialize into a snapshot.
+    """
+
+    def __init__(self,
+                 source: str,
+                 entries: List[Tuple[str, Dict[str, Any]]],
+                 section_terms: Dict[str, Dict[str, int]]):
+        """
+        :param source: file name the entries were extracted from
+        :param entries: (section, entry) pairs; each entry has at least 'content'
+        :param section_terms: section field term counts (see section_fields)
+        """
+        self.source = source
+        self.entries = entries
+        self.lengths = array('I')
+        # Script ratios of each entry, one byte each (see _ratio_byte)
+        self.malayalam = array('B')
+        self.latin = array('B')
+        self.digits = array('B')
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        # Content document frequencies within each language partition
+        self.partition_df: Dict[str, Dict[str, int]] = {language: {} for language in LANGUAGE_PARTITIONS}
+        for local_id, (_, entry) in enumerate(entries):
+            content = entry['content']
+            tokens = tokenize(content)
+            self.lengths.append(len(tokens))
+            malayalam, latin, digits = script_stats(content)
+            self.malayalam.append(_ratio_byte(malayalam))
+            self.latin.append(_ratio_byte(latin))
+            self.digits.append(_ratio_byte(digits))
+            partitions = entry_partitions(self.malayalam[-1], self.latin[-1])
+            for term, tf in term_counts(tokens).items():
+                postings.setdefault(term, []).append((local_id, tf))
+                for language in partitions:
+                    partition_df = self.partition_df[language]
+                    partition_df[term] = partition_df.get(term, 0) + 1
+
+        self.postings, self.doc_ids, self.tfs = _flatten_postings(postings)
+        self.sentences = SentenceTable(entries)
+
+        self.total_length = sum(self.lengths)
+        self.section_df = self._section_document_frequencies(section_terms)
+        for language, partition_df in self.partition_df.items():
+            # Section field terms count entries matching in either field, as in section_df
+            partition_df.update(self._section_document_frequencies(section_terms, language))
+
+    def iter_postings(self, term: str) -> Iterator[Tuple[int, int]]:
+        """(local entry id, term frequency) pairs of a term"""
+        start, count = self.postings.get(term, (0, 0))
+        return zip(self.doc_ids[start:start + count], self.tfs[start:start + count])
+
+    def document_frequency(self, term: str) -> int:
+        """Entries of this segment containing the term in either field"""
+        df = self.section_df.get(term)
+        return df if df is not None else self.postings.get(term, (0, 0))[1]
+
+    def partition_members(self, language: str) -> set:
+        """Local ids of the entries in a language partition"""
+        return {local_id for local_id in range(len(self.entries))
+                if language in entry_partitions(self.malayalam[local_id], self.latin[local_id])}
+
+    def _section_document_frequencies(self, section_terms: Dict[str, Dict[str, int]],
+                                      language: Optional[str] = None) -> Dict[str, int]:
+        """Document frequency of section field terms, counting both fields (within a partition)"""
+        members = self.partition_members(language) if language else None
+        section_docs: Dict[str, set] = {}
+        for local_id, (section, _) in enumerate(self.entries):
+            if members is not None and local_id not in members:
+                continue
+            for term in section_terms.get(section, ()):
+                section_docs.setdefault(term, set()).add(local_id)
+        for term, docs in section_docs.items():
+            docs.update(local_id for local_id, _ in self.iter_postings(term)
+                        if members is None or local_id in members)
+        return {term: len(docs) for term, docs in section_docs.items()}
+
+    # ---------- SERIALIZATION ----------
+    def __getstate__(self) -> Dict[str, Any]:
+        state = {
+            'source': self.source,
+            'entries': self.entries,
+            'lengths': self.lengths,
+            'malayalam': self.malayalam,
+            'latin': self.latin,
+            'digits': self.digits,
+            'total_length': self.total_length,
+            'section_df': self.section_df,
+            'partition_df': self.partition_df,
+            'doc_ids': self.doc_ids,
+            'tfs': self.tfs,
+            'sentences': self.sentences
+        }
+        state.update(_pack_postings(self.postings))
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        postings = _unpack_postings(state)
+        self.__dict__.update(state)
+        self.postings = postings
+
+
+class IndexPartition:
+    """
+    Term statistics of one language partition of a KnowledgeIndex: which
+    entries belong to it, and document frequencies, average length and
+    length norms computed over those entries only. Postings stay shared
+    with the full index; scoring simply skips non-members.
+    """
+
+    def __init__(self, language: str, index: 'KnowledgeIndex'):
+        self.language = language
+        self.members = bytearray(index.doc_count)
+        self.df: Dict[str, int] = {}
+        total_length = 0
+        for base, segment in zip(index.bases, index.segments):
+            for local_id, length in enumerate(segment.lengths):
+                if language in entry_partitions(segment.malayalam[local_id], segment.latin[local_id]):
+                    self.members[base + local_id] = 1
+                    total_length += length
+            for term, count in segment.partition_df[language].items():
+                self.df[term] = self.df.get(term, 0) + count
+
+        self.doc_count = sum(self.members)
+        self.avg_length = (total_length / self.doc_count) if self.doc_count else 0.0
+        self.norms = index.length_norms(self.avg_length)
+
+    def idf(self, term: str) -> float:
+        return bm25_idf(self.doc_count, self.df.get(term, 0))
+
+
+def bm25_idf(doc_count: int, df: int) -> float:
+    return math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+
+
+class KnowledgeIndex:
+    """
+    BM25F index over the segments of a knowledge base.
+
+    Fields:
+      - content: the entry text, length-normalized per entry
+      - section: the section name plus its classifier keywords, shared by
+        every entry of that section and used to boost matching entries
+    Document frequencies, average length and per-entry norms are merged
+    from the segments once here, so a query only touches the postings of
+    its own terms. The same statistics are kept per language partition
+    (see IndexPartition); a query with a language is scored against its
+    partition only.
+    """
+
+    K1 = 1.2
+    CONTENT_WEIGHT = 1.0
+    CONTENT_B = 0.75
+    SECTION_WEIGHT = 0.5
+
+    def __init__(self, segments: List[IndexSegment], section_terms: Dict[str, Dict[str, int]]):
+        """
+        :param segments: one segment per source document, in load order
+        :param section_terms: section field term counts (see section_fields)
+        """
+        self.segments = segments
+        self.section_terms = section_terms
+        self.entries: List[Tuple[str, Dict[str, Any]]] = []
+        self.bases: List[int] = []
+        self.df: Dict[str, int] = {}
+        self.malayalam = array('B')
+        self.latin = array('B')
+        self.digits = array('B')
+
+        total_length = 0
+        for segment in segments:
+            self.bases.append(len(self.entries))
+            self.entries.extend(segment.entries)
+            total_length += segment.total_length
+            self.malayalam.extend(segment.malayalam)
+            self.latin.extend(segment.latin)
+            self.digits.extend(segment.digits)
+            for term, (_, count) in segment.postings.items():
+                self.df[term] = self.df.get(term, 0) + count
+            for term, count in segment.section_df.items():
+                self.df[term] = self.df.get(term, 0) + count - segment.postings.get(term, (0, 0))[1]
+
+        self.doc_count = len(self.entries)
+        self.avg_length = (total_length / self.doc_count) if self.doc_count else 0.0
+        self.norms = self.length_norms(self.avg_length)
+        self.members = None
+        self.sentence_count = sum(len(segment.sentences) for segment in segments)
+        self.avg_sentence_length = (sum(segment.sentences.total_length for segment in segments)
+                                    / self.sentence_count) if self.sentence_count else 0.0
+        # BM25 denominator term k1 * norm of every sentence, per segment
+        self.sentence_norms = [
+            array('f', (self.K1 * ((1 - self.CONTENT_B) + self.CONTENT_B * length / self.avg_sentence_length)
+                        for length in segment.sentences.lengths))
+            for segment in segments
+        ]
+        self.partitions = {language: IndexPartition(language, self) for language in LANGUAGE_PARTITIONS}
+
+        logger.info(f"Indexed {self.doc_count} entries from {len(segments)} sources, {len(self.df)} terms "
+                    f"({', '.join(f'{p.language}: {p.doc_count}' for p in self.partitions.values())})")
+
+    def length_norms(self, avg_length: float) -> List[float]:
+        """Per-entry BM25 length norm: (1 - b) + b * len / avg_len"""
+        return [
+            (1 - self.CONTENT_B) + self.CONTENT_B * (length / avg_length if avg_length else 0.0)
+            for segment in self.segments for length in segment.lengths
+        ]
+
+    @classmethod
+    def from_sections(cls,
+                      knowledge_base: Dict[str, List[Dict[str, Any]]],
+                      section_keywords: Optional[Dict[str, List[str]]] = None) -> 'KnowledgeIndex':
+        """
+        Index a plain section -> entries dict, one segment per entry source.
+        Entries listed under several sections are indexed once, under the
+        first of them.
+        """
+        section_terms = section_fields(knowledge_base.keys(), section_keywords)
+        by_source: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        seen = set()
+        for section, entries in knowledge_base.items():
+            for entry in entries:
+                if id(entry) in seen:
+                    continue
+                seen.add(id(entry))
+                by_source.setdefault(entry.get('source', ''), []).append((section, entry))
+        return cls([IndexSegment(source, entries, section_terms) for source, entries in by_source.items()],
+                   section_terms)
+
+    def replace_sources(self, segments: List[IndexSegment]) -> 'KnowledgeIndex':
+        """
+        New index in which the given segments replace existing segments of
+        the same source (new sources are appended). This index is untouched.
+        """
+        replacements = {segment.source: segment for segment in segments}
+        merged = [replacements.pop(segment.source, segment) for segment in self.segments]
+        merged.extend(segment for segment in segments if segment.source in replacements)
+        return KnowledgeIndex(merged, self.section_terms)
+
+    def view(self, language: Optional[str] = None):
+        """Statistics a query in this language is scored with: its partition, or the full index"""
+        partition = partition_of(language)
+        return self.partitions[partition] if partition else self
+
+    # ---------- SCORING ----------
+    def idf(self, term: str) -> float:
+        return bm25_idf(self.doc_count, self.df.get(term, 0))
+
+    def score(self, query: str, language: Optional[str] = None) -> Dict[int, float]:
+        """
+        BM25F scores for entries matching at least one query term in content.
+        The section field only boosts those candidates; it never pulls in a
+        whole section on its own. With a language, only entries of that
+        language partition are scored, using the partition's statistics.
+        """
+        return self.score_many([query], [language])[0]
+
+    def score_many(self, queries: List[str], languages: Optional[List[Optional[str]]] = None) -> List[Dict[int, float]]:
+        """
+        score() for several queries in one pass: the postings of a term
+        shared by many queries are read once for all of them.
+        """
+        views = [self.view(language) for language in (languages or [None] * len(queries))]
+        query_terms = [set(tokenize(query)) for query in queries]
+        term_queries: Dict[str, List[int]] = {}
+        for position, terms in enumerate(query_terms):
+            for term in terms:
+                term_queries.setdefault(term, []).append(position)
+
+        content_tf: List[Dict[int, Dict[str, int]]] = [{} for _ in queries]
+        for base, segment in zip(self.bases, self.segments):
+            for term, positions in term_queries.items():
+                for local_id, tf in segment.iter_postings(term):
+                    doc_id = base + local_id
+                    for position in positions:
+                        members = views[position].members
+                        if members is None or members[doc_id]:
+                            content_tf[position].setdefault(doc_id, {})[term] = tf
+
+        return [self._score_candidates(terms, candidates, view)
+                for terms, candidates, view in zip(query_terms, content_tf, views)]
+
+    def _score_candidates(self, query_terms: Iterable[str], content_tf: Dict[int, Dict[str, int]],
+                          view) -> Dict[int, float]:
+        idf = {term: view.idf(term) for term in query_terms}
+        scores: Dict[int, float] = {}
+        for doc_id, term_tfs in content_tf.items():
+            section_field = self.section_terms.get(self.entries[doc_id][0], {})
+            norm = view.norms[doc_id]
+            score = 0.0
+            for term in query_terms:
+                weighted_tf = (self.CONTENT_WEIGHT * term_tfs.get(term, 0) / norm
+                               + self.SECTION_WEIGHT * section_field.get(term, 0))
+                if weighted_tf:
+                    score += idf[term] * weighted_tf / (self.K1 + weighted_tf)
+            scores[doc_id] = score
+        return scores
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Knowledge Store – versioned knowledge base snapshots for the Flask apps
+Handles:
+  - One current, fully built knowledge base (section view + index)
+  - Atomic swap on reload, so readers never see a half-built corpus
+  - Single-flight loading, so concurrent requests never load twice
+  - Background reloads that leave in-flight requests on the old snapshot
+"""
+
+from typing import List, Dict, Any, Optional, Callable
+import logging
+import threading
+
+from knowledge_index import KnowledgeBase
+
+logger = logging.getLogger(__name__)
+
+
+class KnowledgeStore:
+    """
+    Holds the current knowledge base snapshot of a processor.
+
+    Readers call current() once per request and use that snapshot
+    throughout; they never take a lock. Writers build a complete new
+    snapshot first and publish it with a single reference assignment.
+    Snapshots are never modified after publication.
+    """
+
+    def __init__(self, processor):
+        """
+        :param processor: AgriculturalDocumentProcessor used to load and patch
+        """
+        self.processor = processor
+        self._snapshot: Optional[KnowledgeBase] = None
+        self._version = 0
+        self._write_lock = threading.Lock()
+
+    # ---------- READ ----------
+    def current(self) -> Optional[KnowledgeBase]:
+        """Latest published snapshot (None until the first load)"""
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        """Incremented on every publish; 0 before the first load"""
+        return self._version
+
+    def ensure_loaded(self) -> KnowledgeBase:
+        """Current snapshot, loading it first if nothing was published yet"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._write_lock:
+            # Another request may have finished loading while we waited
+            if self._snapshot is None:
+                self._build_and_publish(self.processor.load_all_knowledge)
+            return self._snapshot
+
+    # ---------- WRITE ----------
+    def _build_and_publish(self, build: Callable[[], Dict[str, Any]]) -> KnowledgeBase:
+        """Build a snapshot off to the side, then swap it in. Caller holds the write lock."""
+        try:
+            snapshot = build()
+        except Exception as e:
+            logger.error(f"Error building knowledge base snapshot: {e}")
+            if self._snapshot is not None:
+                return self._snapshot
+            snapshot = KnowledgeBase()
+        self._version += 1
+        snapshot.version = self._version
+        self._snapshot = snapshot
+        logger.info(f"Published knowledge base version {self._version}")
+        return snapshot
+
+    def reload(self) -> KnowledgeBase:
+        """Rebuild from the knowledge base directory and publish the result"""
+        with self._write_lock:
+            return self._build_and_publish(self.processor.load_all_knowledge)
+
+    def update(self, knowledge_entries: List[Dict[str, Any]]) -> KnowledgeBase:
+        """Publish the current snapshot patched with freshly processed entries"""
+        with self._write_lock:
+            base = self._snapshot
+            if base is None:
+                return self._build_and_publish(self.processor.load_all_knowledge)
+            if not knowledge_entries:
+                return base
+            return self._build_and_publish(lambda: self.processor.update_knowledge(base, knowledge_entries))
+
+    def reload_in_background(self) -> threading.Thread:
+        """Start reload() on a daemon thread; requests keep using the old snapshot meanwhile"""
+        thread = threading.Thread(target=self.reload, name="knowledge-reload", daemon=True)
+        thread.start()
+        return thread
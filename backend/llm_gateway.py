@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+LLM Gateway – bounded, deadline-aware access to the answer model
+Handles:
+  - A fixed worker pool, so upstream calls never run on Flask request threads
+  - A concurrency limit on in-flight upstream calls
+  - Per-call deadlines: callers stop waiting when time is up
+  - Coalescing: concurrent identical prompts share one upstream call
+  - Circuit breaker: after repeated failures calls fail fast for a while,
+    then a single probe call decides whether the model is back
+  - Streaming: answer chunks forwarded as they arrive, and the upstream
+    call abandoned as soon as the caller stops reading
+  - Pluggable backends: Gemini in production, any HTTP endpoint (e.g. a
+    local stub server) for testing
+"""
+
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Optional, Callable, Iterable, Iterator
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+
+class LLMGatewayError(Exception):
+    """Base class of gateway failures"""
+
+
+class LLMTimeoutError(LLMGatewayError, TimeoutError):
+    """The deadline passed before the upstream call produced an answer"""
+
+
+class LLMOverloadedError(LLMGatewayError):
+    """No concurrency slot became free before the deadline"""
+
+
+class CircuitOpenError(LLMGatewayError):
+    """The circuit breaker is open; the model is not being called"""
+
+
+# ---------- CIRCUIT BREAKER ----------
+class CircuitBreaker:
+    """
+    Closed -> open after failure_threshold consecutive failures (errors,
+    429s, timeouts). Open calls are refused until reset_seconds have passed;
+    then the breaker is half-open and lets one probe call through. The probe
+    closes the breaker on success and reopens it on failure.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 3, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now (claims the probe when half-open)"""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release(self) -> None:
+        """Give back a call allowed by allow() that never went upstream"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("LLM circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                    logger.warning(f"LLM circuit opened after {self.failures} consecutive failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'trips': self.trips,
+                'reset_seconds': self.reset_seconds
+            }
+
+
+# ---------- BACKENDS ----------
+def gemini_backend(model) -> Callable[[str, float], str]:
+    """Backend calling a google.generativeai GenerativeModel"""
+    def generate(prompt: str, timeout: float) -> str:
+        return model.generate_content(prompt, request_options={'timeout': timeout}).text
+    return generate
+
+
+def gemini_stream_backend(model) -> Callable[[str, float], Iterable[str]]:
+    """Streaming backend calling a google.generativeai GenerativeModel"""
+    def stream(prompt: str, timeout: float) -> Iterator[str]:
+        for chunk in model.generate_content(prompt, stream=True, request_options={'timeout': timeout}):
+            yield chunk.text
+    return stream
+
+
+def http_backend(url: str) -> Callable[[str, float], str]:
+    """
+    Backend posting {"prompt": ...} as JSON to url and reading {"text": ...}
+    back; used to run the apps against a local stub server.
+    """
+    def generate(prompt: str, timeout: float) -> str:
+        request = urllib.request.Request(
+            url,
+            data=json.dumps({'prompt': prompt}).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read().decode('utf-8'))['text']
+    return generate
+
+
+def http_stream_backend(url: str) -> Callable[[str, float], Iterable[str]]:
+    """
+    Streaming backend posting {"prompt": ..., "stream": true} to url and
+    reading one {"text": ...} JSON object per response line.
+    """
+    def stream(prompt: str, timeout: float) -> Iterator[str]:
+        request = urllib.request.Request(
+            url,
+            data=json.dumps({'prompt': prompt, 'stream': True}).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line.decode('utf-8'))['text']
+    return stream
+
+
+# End-of-stream marker passed from the pump thread to the reader
+_END = object()
+
+
+# ---------- GATEWAY ----------
+class LLMGateway:
+    """
+    Runs backend calls on a bounded pool of worker threads.
+
+    generate() waits at most until its deadline. A call that overruns keeps
+    its concurrency slot until the backend returns (the backend's own
+    timeout bounds that), so a slow upstream can never pile up more than
+    max_concurrency calls.
+    """
+
+    def __init__(self, backend: Callable[[str, float], str],
+                 max_concurrency: int = 4, timeout_seconds: float = 20.0,
+                 stream_backend: Optional[Callable[[str, float], Iterable[str]]] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        """
+        :param backend: callable(prompt, timeout_seconds) -> answer text
+        :param stream_backend: callable(prompt, timeout_seconds) -> text chunks;
+            without one, stream() yields the whole answer as a single chunk
+        :param max_concurrency: upstream calls allowed in flight at once
+        :param timeout_seconds: default per-call deadline
+        :param breaker: circuit breaker guarding the backend (a default one if omitted)
+        """
+        self.backend = backend
+        self.stream_backend = stream_backend
+        self.breaker = breaker or CircuitBreaker()
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    def generate(self, prompt: str, timeout: Optional[float] = None,
+                 deadline: Optional[float] = None) -> str:
+        """
+        Answer text for a prompt.
+        :param timeout: seconds to wait (defaults to timeout_seconds)
+        :param deadline: absolute time.monotonic() deadline shared by several
+            calls; takes precedence over timeout
+        :raises CircuitOpenError, LLMTimeoutError, LLMOverloadedError, or the backend's own error
+        """
+        if deadline is None:
+            deadline = time.monotonic() + (timeout if timeout is not None else self.timeout_seconds)
+
+        with self._lock:
+            future = self._in_flight.get(prompt)
+            owner = future is None
+            if owner:
+                # Registered before a slot is free, so identical prompts
+                # arriving while this one queues still coalesce onto it
+                future = Future()
+                self._in_flight[prompt] = future
+            else:
+                self.coalesced += 1
+
+        if owner:
+            self._start(prompt, future, deadline)
+
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            # Counted against the breaker once, by _call, when the upstream call finishes late
+            with self._lock:
+                self.timeouts += 1
+            raise LLMTimeoutError(f"LLM call exceeded its deadline ({prompt[:60]}...)")
+
+    def _start(self, prompt: str, future: Future, deadline: float) -> None:
+        """Run the upstream call for future once a concurrency slot is free"""
+        if not self.breaker.allow():
+            self._settle(prompt, future, error=CircuitOpenError("LLM circuit is open"))
+            return
+        if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            self.breaker.release()
+            with self._lock:
+                self.rejected += 1
+            self._settle(prompt, future, error=LLMOverloadedError("All LLM slots are busy"))
+            return
+        with self._lock:
+            self.calls += 1
+        self._executor.submit(self._call, prompt, future, deadline)
+
+    def _call(self, prompt: str, future: Future, deadline: float) -> None:
+        """One upstream call; the breaker sees exactly one outcome for it, however many waiters share it"""
+        try:
+            answer = self.backend(prompt, max(0.1, deadline - time.monotonic()))
+        except Exception as e:
+            logger.warning(f"LLM backend error: {e}")
+            self.breaker.record_failure()
+            self._settle(prompt, future, error=e)
+        else:
+            # An answer after the deadline already timed its waiters out
+            if time.monotonic() > deadline:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            self._settle(prompt, future, answer=answer)
+        finally:
+            self._slots.release()
+
+    def _settle(self, prompt: str, future: Future, answer: Optional[str] = None,
+                error: Optional[BaseException] = None) -> None:
+        """Stop coalescing onto future, then hand its outcome to every waiter"""
+        with self._lock:
+            if self._in_flight.get(prompt) is future:
+                del self._in_flight[prompt]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(answer)
+
+    # ---------- STREAMING ----------
+    def stream(self, prompt: str, timeout: Optional[float] = None,
+               deadline: Optional[float] = None) -> Iterator[str]:
+        """
+        Answer text chunks as the backend produces them. Streams are never
+        coalesced. Closing the iterator early (or the deadline passing
+        between two chunks) stops the upstream call at its next chunk.
+        :raises CircuitOpenError, LLMTimeoutError, LLMOverloadedError, or the backend's own error
+        """
+        if deadline is None:
+            deadline = time.monotonic() + (timeout if timeout is not None else self.timeout_seconds)
+        if not self.breaker.allow():
+            raise CircuitOpenError("LLM circuit is open")
+        if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            self.breaker.release()
+            with self._lock:
+                self.rejected += 1
+            raise LLMOverloadedError("All LLM slots are busy")
+        with self._lock:
+            self.calls += 1
+
+        chunks: 'queue.Queue[Any]' = queue.Queue()
+        cancelled = threading.Event()
+        self._executor.submit(self._pump, prompt, deadline, chunks, cancelled)
+        try:
+            while True:
+                try:
+                    item = chunks.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    # Counted against the breaker by _pump once the upstream call ends
+                    with self._lock:
+                        self.timeouts += 1
+                    raise LLMTimeoutError(f"LLM stream exceeded its deadline ({prompt[:60]}...)")
+                if item is _END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+
+    def _pump(self, prompt: str, deadline: float, chunks: queue.Queue, cancelled: threading.Event) -> None:
+        """Move backend chunks into the reader's queue until done or cancelled"""
+        timeout = max(0.1, deadline - time.monotonic())
+        try:
+            if self.stream_backend is None:
+                chunks.put(self.backend(prompt, timeout))
+                return
+            upstream = self.stream_backend(prompt, timeout)
+            try:
+                for chunk in upstream:
+                    if cancelled.is_set():
+                        break
+                    chunks.put(chunk)
+            finally:
+                close = getattr(upstream, 'close', None)
+                if close is not None:
+                    close()
+        except Exception as e:
+            logger.warning(f"LLM backend error: {e}")
+            self.breaker.record_failure()
+            chunks.put(e)
+        else:
+            if time.monotonic() > deadline:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+        finally:
+            chunks.put(_END)
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'coalesced': self.coalesced,
+                'timeouts': self.timeouts,
+                'rejected': self.rejected,
+                'in_flight': len(self._in_flight),
+                'max_concurrency': self.max_concurrency,
+                'timeout_seconds': self.timeout_seconds,
+                'circuit': self.breaker.stats()
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ---------- FACTORY ----------
+def gateway_for(model, max_concurrency: int = 4, timeout_seconds: float = 20.0) -> LLMGateway:
+    """
+    Gateway the apps send every model call through: the Gemini model, or the
+    stub server at LLM_STUB_URL when that variable is set.
+    """
+    stub_url = os.environ.get("LLM_STUB_URL")
+    if stub_url:
+        return LLMGateway(http_backend(stub_url), max_concurrency=max_concurrency,
+                          timeout_seconds=timeout_seconds, stream_backend=http_stream_backend(stub_url))
+    return LLMGateway(gemini_backend(model), max_concurrency=max_concurrency,
+                      timeout_seconds=timeout_seconds, stream_backend=gemini_stream_backend(model))
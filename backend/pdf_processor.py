@@ -8,36 +8,88 @@ Handles:
   - Knowledge base saving/loading/searching with advanced relevance ranking
 """
 
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Union, Tuple, Iterator, Iterable
+from collections import deque
+import argparse
+import bisect
+import copy
+import hashlib
+import heapq
+import itertools
 import json
 import logging
+import os
+import pickle
 import re
+import tempfile
 
 # Primary extraction libraries
 import fitz  # PyMuPDF
 import PyPDF2  # Fallback if fitz fails
 
+from knowledge_index import KnowledgeBase, KnowledgeIndex, IndexSegment, section_fields, SENTENCE_SPAN
+from corpus_store import MappedCorpus, CorpusEntry
+
 # -----------------------------
 # Logging setup
 # -----------------------------
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
 logger = logging.getLogger(__name__)
 
+# Characters that continue a word. Malayalam vowel signs, anusvara and virama
+# are not \w, so \b cannot delimit keywords like "വളം" or "വിളവ്".
+WORD_CHARS = r'\w\u0D00-\u0D7F\u200c\u200d'
+
+# Sentence boundaries used when classifying document text
+SENTENCE_DELIMITERS = re.compile(r'[.!?]+')
+
+# clean_text patterns
+PAGE_FOOTER = re.compile(r'Page \d+ of \d+', re.IGNORECASE)
+PAGE_NUMBER_ONLY = re.compile(r'\d+\s*')
+DISALLOWED_CHARS = re.compile(r'[^\w\s\u0D00-\u0D7F.,!?;:/%+\-]')
+
 
 class AgriculturalDocumentProcessor:
+    # Sentence-window passages: up to N sentences, capped in characters
+    PASSAGE_SENTENCES = 3
+    PASSAGE_MAX_CHARS = 600
+    # PDFs with at least this many pages are extracted in parallel page ranges
+    PARALLEL_PAGE_THRESHOLD = 200
+    # Pages per range handed to a worker, and ranges in flight per worker
+    PAGE_RANGE_SIZE = 50
+    RANGES_PER_WORKER = 2
+    # Text without a sentence delimiter is cut into a sentence once it grows
+    # this long, so punctuation-free tables cannot grow one unbounded buffer
+    SENTENCE_CARRY_LIMIT = 4000
+    # Bump whenever process_file output changes, so the manifest forces a rebuild
+    PROCESSOR_VERSION = 4
+    MANIFEST_FILE = "ingest_manifest.json"
+    # Prebuilt index + memory-mapped passage text, written by build_snapshot
+    # (python pdf_processor.py --build-snapshot)
+    SNAPSHOT_FILE = "knowledge_snapshot.pkl"
+    CORPUS_FILE = "knowledge_corpus.bin"
+    SNAPSHOT_FORMAT = 6
+    # Per-source index segments, keyed by source content hash
+    SEGMENT_CACHE_DIR = "segment_cache"
+
     def __init__(self,
                  knowledge_base_dir: str = "knowledge_base",
-                 keyword_config_file: str = "keywords_config.json"):
+                 keyword_config_file: str = "keywords_config.json",
+                 page_workers: Union[int, None] = None):
         """
         :param knowledge_base_dir: directory to store JSON knowledge files
         :param keyword_config_file: path to JSON config of keywords
+        :param page_workers: processes used to extract large PDFs (None = CPU count)
         """
         self.knowledge_base_dir = Path(knowledge_base_dir)
         self.knowledge_base_dir.mkdir(exist_ok=True)
         self.keyword_config_file = Path(keyword_config_file)
+        self.page_workers = page_workers or os.cpu_count() or 1
         self.section_keywords = self._load_keywords()
+        self._keyword_pattern, self._keyword_sections = self._compile_keywords()
         self.processed_files: List[str] = []
 
     # ---------- CONFIG LOADING ----------
@@ -54,6 +106,38 @@ class AgriculturalDocumentProcessor:
             'general': ['advice', 'guidance', 'tip', 'information']
         }
 
+    def _compile_keywords(self):
+        """
+        Compile every configured keyword into one alternation, tried longest
+        first at each word start. English keywords must end on a word
+        boundary; Malayalam keywords only need to start a word, since case
+        and compound suffixes attach directly (കൃഷി -> കൃഷിക്കൂട്ടങ്ങൾ).
+        A keyword match also counts for shorter keywords it extends
+        ("crop yield" -> "crop"), so a single scan tags a sentence with
+        every matching section.
+        """
+        keyword_sections: Dict[str, set] = {}
+        for section, keywords in self.section_keywords.items():
+            for kw in keywords:
+                keyword_sections.setdefault(kw.lower(), set()).add(section)
+
+        def is_malayalam(kw: str) -> bool:
+            return any('\u0D00' <= char <= '\u0D7F' for char in kw)
+
+        closure: Dict[str, set] = {}
+        for kw in keyword_sections:
+            closure[kw] = set()
+            for other, sections in keyword_sections.items():
+                if kw.startswith(other) and (len(other) == len(kw) or is_malayalam(other)
+                                             or not re.match(f'[{WORD_CHARS}]', kw[len(other)])):
+                    closure[kw] |= sections
+
+        alternatives = []
+        for kw in sorted(keyword_sections, key=len, reverse=True):
+            alternatives.append(re.escape(kw) if is_malayalam(kw) else f'{re.escape(kw)}(?![{WORD_CHARS}])')
+        pattern = re.compile(f'(?<![{WORD_CHARS}])(?=({"|".join(alternatives)}))')
+        return pattern, closure
+
     # ---------- FILE TYPE HANDLING ----------
     def _is_pdf(self, path: str) -> bool:
         return Path(path).suffix.lower() == '.pdf'
@@ -62,23 +146,59 @@ class AgriculturalDocumentProcessor:
         return Path(path).suffix.lower() == '.txt'
 
     # ---------- TEXT EXTRACTION ----------
-    def extract_text_from_pdf(self, pdf_path: str) -> str:
-        """Extract text from PDF using PyMuPDF first, then PyPDF2 as fallback"""
+    def iter_pages_from_pdf(self, pdf_path: str) -> Iterator[str]:
+        """
+        Yield the text of every page, in order, using PyMuPDF first and
+        PyPDF2 as fallback; if PyMuPDF fails part-way, PyPDF2 continues
+        from the first page not yet yielded. Large documents are split into
+        page ranges extracted concurrently in worker processes, with only a
+        few ranges in flight at a time.
+        """
+        yielded = 0
         try:
             with fitz.open(pdf_path) as doc:
-                text = "\n".join(page.get_text() for page in doc)
-            return text.strip()
+                page_count = doc.page_count
+                workers = min(self.page_workers, page_count)
+                if page_count < self.PARALLEL_PAGE_THRESHOLD or workers <= 1:
+                    for page in doc:
+                        yield page.get_text()
+                        yielded += 1
+                    return
+
+            starts = range(0, page_count, self.PAGE_RANGE_SIZE)
+            logger.info(f"Extracting {page_count} pages of {pdf_path} in {len(starts)} ranges")
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = deque()
+                for start in starts:
+                    pending.append(pool.submit(_extract_page_range, pdf_path, start,
+                                               min(start + self.PAGE_RANGE_SIZE, page_count)))
+                    if len(pending) >= workers * self.RANGES_PER_WORKER:
+                        for text in pending.popleft().result():
+                            yield text
+                            yielded += 1
+                while pending:
+                    for text in pending.popleft().result():
+                        yield text
+                        yielded += 1
+            return
         except Exception as e:
-            logger.warning(f"PyMuPDF failed for {pdf_path}: {e}")
+            logger.warning(f"PyMuPDF failed for {pdf_path} after {yielded} pages: {e}")
 
         try:
             with open(pdf_path, 'rb') as f:
                 reader = PyPDF2.PdfReader(f)
-                text = "\n".join(page.extract_text() or '' for page in reader.pages)
-            return text.strip()
+                for page in reader.pages[yielded:]:
+                    yield page.extract_text() or ''
         except Exception as e:
             logger.error(f"Both extraction methods failed for {pdf_path}: {e}")
-            return ""
+
+    def extract_pages_from_pdf(self, pdf_path: str) -> List[str]:
+        """Extract the text of every page, in order (see iter_pages_from_pdf)"""
+        return list(self.iter_pages_from_pdf(pdf_path))
+
+    def extract_text_from_pdf(self, pdf_path: str) -> str:
+        """Extract text from PDF using PyMuPDF first, then PyPDF2 as fallback"""
+        return "\n".join(self.extract_pages_from_pdf(pdf_path)).strip()
 
     def extract_text_from_txt(self, txt_path: str) -> str:
         """Extract text from a .txt file"""
@@ -90,162 +210,817 @@ class AgriculturalDocumentProcessor:
             logger.error(f"Error reading TXT file {txt_path}: {e}")
             return ""
 
+    def iter_pages(self, file_path: str) -> Iterator[str]:
+        """Page texts of a PDF, or the whole text of a TXT file as one page"""
+        if self._is_pdf(file_path):
+            return self.iter_pages_from_pdf(file_path)
+        return iter([self.extract_text_from_txt(file_path)])
+
     # ---------- CLEAN TEXT ----------
     def clean_text(self, text: str) -> str:
         """Clean and normalize extracted text"""
-        text = re.sub(r'\s+', ' ', text)
-        text = re.sub(r'Page \d+ of \d+', '', text, flags=re.IGNORECASE)
-        text = re.sub(r'^\d+\s*$', '', text, flags=re.MULTILINE)
-        text = re.sub(r'[^\w\s\u0D00-\u0D7F.,!?;:/%+\-]', ' ', text)
-        return text.strip()
+        leading_space = text[:1].isspace()
+        text = PAGE_FOOTER.sub('', ' '.join(text.split()))
+        if not leading_space and PAGE_NUMBER_ONLY.fullmatch(text):
+            return ''
+        return DISALLOWED_CHARS.sub(' ', text).strip()
+
+    def iter_cleaned_text(self, pages: Iterable[str], layout: Dict[str, Any]) -> Iterator[str]:
+        """
+        Clean page by page, yielding the pieces of the document text (pages
+        and the single spaces joining them) without ever building it whole.
+        layout['page_offsets'] collects each page's start offset in the
+        cleaned text and layout['total_text_length'] its running length.
+        """
+        page_offsets = layout.setdefault('page_offsets', [])
+        length = layout.get('total_text_length', 0)
+        for page in pages:
+            cleaned = self.clean_text(page)
+            if cleaned and length:
+                length += 1
+                layout['total_text_length'] = length
+                yield ' '
+            page_offsets.append(length)
+            if cleaned:
+                length += len(cleaned)
+                layout['total_text_length'] = length
+                yield cleaned
+
+    def iter_sentences(self, pieces: Iterable[str]) -> Iterator[Tuple[int, str]]:
+        """
+        (offset, sentence) of text arriving in pieces, as splitting the
+        joined text would give them; offset is where the sentence starts in
+        that text. Only the unfinished tail is carried between pieces.
+        """
+        carry: List[str] = []
+        carry_start = carry_length = position = 0
+        for piece in pieces:
+            cursor = 0
+            for match in SENTENCE_DELIMITERS.finditer(piece):
+                carry.append(piece[cursor:match.start()])
+                yield carry_start, ''.join(carry)
+                carry, carry_length = [], 0
+                cursor = match.end()
+                carry_start = position + cursor
+            carry.append(piece[cursor:])
+            carry_length += len(piece) - cursor
+            position += len(piece)
+            if carry_length > self.SENTENCE_CARRY_LIMIT:
+                yield carry_start, ''.join(carry)
+                carry, carry_start, carry_length = [], position, 0
+        yield carry_start, ''.join(carry)
 
     # ---------- CLASSIFY SECTIONS ----------
+    def classify_sentence(self, sentence: str) -> List[str]:
+        """Sections whose keywords occur in the sentence, in config order"""
+        matched = set()
+        if self._keyword_sections:
+            for match in self._keyword_pattern.finditer(sentence.lower()):
+                matched |= self._keyword_sections[match.group(1)]
+        return [section for section in self.section_keywords if section in matched]
+
+    def iter_classified(self, sentences: Iterable[Tuple[int, str]],
+                        page_offsets: Union[List[int], None] = None) -> Iterator[List[Union[str, int]]]:
+        """
+        [sentence, section mask, page] of every classified sentence, in
+        document order. Each distinct sentence is kept once, on the page it
+        first starts on (1-based, from page_offsets; 1 without them); bit i
+        of its mask is set when it belongs to the i-th configured section.
+        Only sentence hashes are remembered for deduplication.
+        """
+        bits = {section: 1 << i for i, section in enumerate(self.section_keywords)}
+        seen = set()
+        for offset, sentence in sentences:
+            stripped = sentence.strip()
+            if len(stripped) < 8 or hash(stripped) in seen:
+                continue
+            mask = 0
+            for section in self.classify_sentence(stripped):
+                mask |= bits[section]
+            if mask:
+                seen.add(hash(stripped))
+                offset += len(sentence) - len(sentence.lstrip())
+                page = self.page_number(page_offsets, offset) if page_offsets else 1
+                yield [stripped, mask, page]
+
+    def classify_sentences(self, text: str) -> List[List[Union[str, int]]]:
+        """Classified, deduplicated sentences of a text (see iter_classified)"""
+        return list(self.iter_classified(self.iter_sentences([text])))
+
     def extract_sections(self, text: str) -> Dict[str, str]:
         """Classify text sentences into agricultural sections"""
-        sections = {k: '' for k in self.section_keywords.keys()}
-        sentences = re.split(r'[.!?]+', text)
+        return section_views(list(self.section_keywords), self.classify_sentences(text))
 
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if len(sentence) < 8:
-                continue
-            for section, keywords in self.section_keywords.items():
-                for kw in keywords:
-                    if re.search(r'\b' + re.escape(kw.lower()) + r'\b', sentence.lower()):
-                        sections[section] += sentence + ". "
-                        break
-        return sections
+    # ---------- PASSAGES ----------
+    def _bounded_pieces(self, text: str, start: int, end: int) -> Iterator[Tuple[int, int]]:
+        """Split an overlong sentence span at word boundaries"""
+        while end - start > self.PASSAGE_MAX_CHARS:
+            cut = text.rfind(' ', start, start + self.PASSAGE_MAX_CHARS)
+            if cut <= start:
+                cut = start + self.PASSAGE_MAX_CHARS
+            yield start, cut
+            start = cut
+            while start < end and text[start].isspace():
+                start += 1
+        if start < end:
+            yield start, end
 
-    # ---------- PROCESS FILE ----------
-    def process_file(self, file_path: str) -> Dict[str, Any]:
-        """Extract, clean, classify one file (PDF or TXT)"""
-        logger.info(f"Processing file: {file_path}")
-        if self._is_pdf(file_path):
-            raw_text = self.extract_text_from_pdf(file_path)
-        elif self._is_txt(file_path):
-            raw_text = self.extract_text_from_txt(file_path)
-        else:
-            return {"error": f"Unsupported file type: {file_path}"}
+    def split_passages(self, text: str) -> List[Tuple[int, int]]:
+        """(start, end) offsets of sentence-window passages within text"""
+        spans = []
+        start = end = None
+        count = 0
+        for match in SENTENCE_SPAN.finditer(text):
+            s_start, s_end = match.start(), match.end()
+            while s_start < s_end and text[s_start].isspace():
+                s_start += 1
+            while s_end > s_start and text[s_end - 1].isspace():
+                s_end -= 1
+            for piece_start, piece_end in self._bounded_pieces(text, s_start, s_end):
+                if start is not None and (count >= self.PASSAGE_SENTENCES
+                                          or piece_end - start > self.PASSAGE_MAX_CHARS):
+                    spans.append((start, end))
+                    start = None
+                if start is None:
+                    start, count = piece_start, 0
+                end = piece_end
+                count += 1
+        if start is not None:
+            spans.append((start, end))
+        return spans
 
-        if not raw_text:
-            return {"error": "Could not extract text"}
+    def build_passages(self,
+                       file_name: str,
+                       section_names: List[str],
+                       sentences: List[List[Union[str, int]]]) -> List[Dict[str, Any]]:
+        """
+        Passage records over the deduplicated sentences of a document.
+        Each passage is tagged with every section of its sentences; its
+        primary section is the one most of them belong to, and its page the
+        one its first sentence starts on (when sentences carry pages). IDs are derived
+        from file and offset, so they stay stable as long as the document
+        text does.
+        """
+        stem = Path(file_name).stem
+        body = sentence_body(sentences)
+        starts, offset = [], 0
+        for sentence, *_ in sentences:
+            starts.append(offset)
+            offset += len(sentence) + 2
 
-        cleaned_text = self.clean_text(raw_text)
-        sections = self.extract_sections(cleaned_text)
+        passages = []
+        for start, end in self.split_passages(body):
+            counts = [0] * len(section_names)
+            first = bisect.bisect_right(starts, start) - 1
+            last = bisect.bisect_left(starts, end)
+            for _, mask, *_ in sentences[first:last]:
+                for bit in range(len(section_names)):
+                    if mask >> bit & 1:
+                        counts[bit] += 1
+            tagged = [bit for bit, count in enumerate(counts) if count]
+            passage = {
+                'id': f"{stem}:{start}",
+                'section': section_names[max(tagged, key=lambda bit: (counts[bit], -bit))],
+                'sections': [section_names[bit] for bit in tagged],
+                'start': start,
+                'end': end
+            }
+            if len(sentences[first]) > 2:
+                passage['page'] = sentences[first][2]
+            passages.append(passage)
+        return passages
 
-        processed_at = datetime.fromtimestamp(Path(file_path).stat().st_mtime).isoformat()
+    # ---------- PROCESS FILE ----------
+    @staticmethod
+    def page_number(page_offsets: List[int], offset: int) -> int:
+        """1-based page containing a cleaned-text offset"""
+        return max(bisect.bisect_right(page_offsets, offset), 1)
 
-        knowledge_entry = {
+    def _pipeline(self, file_path: str) -> Union[Tuple[Dict[str, Any], Iterator[List[Union[str, int]]]], None]:
+        """
+        (entry header, classified sentence stream) of one file: pages are
+        extracted, cleaned, split and classified lazily as the stream is
+        consumed, which also fills in the header's page offsets and text
+        length. None when the file yields no text.
+        """
+        entry = {
             'file_name': Path(file_path).name,
             'file_path': file_path,
-            'processed_at': processed_at,
-            'total_text_length': len(cleaned_text),
-            'sections': sections,
-            'full_text': cleaned_text[:5000]
+            'processed_at': datetime.fromtimestamp(Path(file_path).stat().st_mtime).isoformat(),
+            'total_text_length': 0,
+            'page_offsets': [],
+            'section_names': list(self.section_keywords)
         }
+        pieces = self.iter_cleaned_text(self.iter_pages(file_path), entry)
+        first = next(pieces, None)
+        if first is None:
+            return None
+        pieces = itertools.chain([first], pieces)
+        return entry, self.iter_classified(self.iter_sentences(pieces), entry['page_offsets'])
+
+    def process_file(self, file_path: str) -> Dict[str, Any]:
+        """Extract, clean, classify one file (PDF or TXT)"""
+        logger.info(f"Processing file: {file_path}")
+        if not (self._is_pdf(file_path) or self._is_txt(file_path)):
+            return {"error": f"Unsupported file type: {file_path}"}
+        pipeline = self._pipeline(file_path)
+        if pipeline is None:
+            return {"error": "Could not extract text"}
+        knowledge_entry, sentences = pipeline
+        knowledge_entry['sentences'] = list(sentences)
+        return knowledge_entry
+
+    def ingest_file(self, file_path: str) -> Dict[str, Any]:
+        """
+        Process one file straight into its knowledge JSON file. Sentences are
+        written as they are classified, so memory stays bounded by a page
+        range rather than the document. Returns the entry without its
+        sentences, plus 'saved_path'.
+        """
+        logger.info(f"Ingesting file: {file_path}")
+        if not (self._is_pdf(file_path) or self._is_txt(file_path)):
+            return {"error": f"Unsupported file type: {file_path}"}
+        pipeline = self._pipeline(file_path)
+        if pipeline is None:
+            return {"error": "Could not extract text"}
+        knowledge_entry, sentences = pipeline
+        knowledge_entry['saved_path'] = self.write_entry(knowledge_entry, sentences)
         return knowledge_entry
 
     # ---------- SAVE ----------
-    def save_entry(self, knowledge_entry: Dict[str, Any]) -> str:
-        """Save processed knowledge entry as JSON"""
-        filename = f"{Path(knowledge_entry['file_name']).stem}_knowledge.json"
-        filepath = self.knowledge_base_dir / filename
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(knowledge_entry, f, ensure_ascii=False, indent=2)
+    def write_entry(self, header: Dict[str, Any], sentences: Iterable[List[Union[str, int]]]) -> str:
+        """
+        Write a knowledge entry JSON file incrementally: one sentence per
+        line as the stream yields it, then the header fields, read only
+        once the stream is exhausted so a pipeline can still be filling
+        them in. The file replaces any previous version atomically.
+        """
+        filepath = self._output_path(header['file_name'])
+        tmp_path = filepath.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('{\n  "sentences": [')
+            separator = '\n    '
+            for sentence in sentences:
+                f.write(separator + json.dumps(sentence, ensure_ascii=False))
+                separator = ',\n    '
+            f.write('\n  ]' if separator != '\n    ' else ']')
+            for key, value in header.items():
+                if key not in ('sentences', 'saved_path'):
+                    f.write(f',\n  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}')
+            f.write('\n}\n')
+        os.replace(tmp_path, filepath)
         logger.info(f"Saved knowledge entry: {filepath}")
         return str(filepath)
 
+    def save_entry(self, knowledge_entry: Dict[str, Any]) -> str:
+        """Save processed knowledge entry as JSON"""
+        return self.write_entry(knowledge_entry, knowledge_entry.get('sentences', []))
+
+    # ---------- INGEST MANIFEST ----------
+    def _manifest_path(self) -> Path:
+        return self.knowledge_base_dir / self.MANIFEST_FILE
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Source path -> hash, size, mtime and versions of its last ingestion"""
+        path = self._manifest_path()
+        if path.exists():
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable manifest {path}: {e}")
+        return {}
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        with open(self._manifest_path(), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    def _keywords_version(self) -> str:
+        config = json.dumps(self.section_keywords, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(config.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def _file_hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _output_path(self, file_name: str) -> Path:
+        return self.knowledge_base_dir / f"{Path(file_name).stem}_knowledge.json"
+
+    def _is_unchanged(self, file_path: str, manifest: Dict[str, Any]) -> bool:
+        """
+        True when the file was ingested with the current processor and keyword
+        config and its content has not changed since. Size and mtime are
+        checked first; the content hash only when they differ.
+        """
+        record = manifest.get(str(Path(file_path).resolve()))
+        if (not record
+                or record.get('processor_version') != self.PROCESSOR_VERSION
+                or record.get('keywords_version') != self._keywords_version()
+                or not self._output_path(file_path).exists()):
+            return False
+        stat = Path(file_path).stat()
+        if record.get('size') == stat.st_size and record.get('mtime_ns') == stat.st_mtime_ns:
+            return True
+        if record.get('size') == stat.st_size and record.get('sha256') == self._file_hash(file_path):
+            record['mtime_ns'] = stat.st_mtime_ns
+            return True
+        return False
+
+    def _manifest_record(self, file_path: str) -> Dict[str, Any]:
+        stat = Path(file_path).stat()
+        return {
+            'sha256': self._file_hash(file_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'processor_version': self.PROCESSOR_VERSION,
+            'keywords_version': self._keywords_version(),
+            'output': self._output_path(file_path).name
+        }
+
     # ---------- PROCESS MULTIPLE ----------
-    def process_multiple_files(self, directory: str) -> List[Dict[str, Any]]:
-        """Process all PDFs and TXTs in a directory"""
+    def iter_process_files(self,
+                           directory: str,
+                           workers: Union[int, None] = 1,
+                           skip: Union[set, None] = None,
+                           write: bool = False) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Process all PDFs and TXTs in a directory, yielding (file_path, entry)
+        as each file finishes. Failed files yield an entry with an 'error' key.
+
+        :param workers: 1 processes serially; more fans files out to a process
+                        pool of that size; None uses one worker per CPU
+        :param skip: file paths to leave out
+        :param write: stream each file straight into its knowledge JSON file
+                      (see ingest_file); entries then come without sentences
+        """
+        process = self.ingest_file if write else self.process_file
         dir_path = Path(directory)
         if not dir_path.exists():
             logger.error(f"Directory not found: {directory}")
-            return []
-        files = list(dir_path.glob("*.pdf")) + list(dir_path.glob("*.txt"))
+            return
+        files = [str(f) for f in list(dir_path.glob("*.pdf")) + list(dir_path.glob("*.txt"))]
         if not files:
             logger.warning(f"No PDF/TXT files found in {directory}")
-            return []
+            return
+        files = [f for f in files if f not in (skip or ())]
+        if not files:
+            return
+
+        workers = min(workers or os.cpu_count() or 1, len(files))
+        if workers <= 1:
+            for file in files:
+                try:
+                    yield file, process(file)
+                except Exception as e:
+                    yield file, {"error": str(e)}
+            return
+
+        logger.info(f"Processing {len(files)} files with {workers} worker processes")
+        config = (str(self.knowledge_base_dir), str(self.keyword_config_file))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_process_file_in_worker, config, file, write): file for file in files}
+            for future in as_completed(futures):
+                file = futures[future]
+                try:
+                    yield file, future.result()
+                except Exception as e:
+                    yield file, {"error": str(e)}
+
+    def process_multiple_files(self,
+                               directory: str,
+                               workers: Union[int, None] = 1,
+                               force: bool = False) -> List[Dict[str, Any]]:
+        """
+        Process new or modified PDFs and TXTs in a directory, streaming each
+        into its knowledge JSON file. Files recorded in the ingest manifest
+        with the same content, processor version and keyword config are
+        skipped unless force is set. Returns only the entries that were
+        (re)processed, without their sentences but with their 'saved_path'.
+        """
+        manifest = self._load_manifest()
+        skip = set()
+        if not force:
+            dir_path = Path(directory)
+            for file in list(dir_path.glob("*.pdf")) + list(dir_path.glob("*.txt")):
+                if self._is_unchanged(str(file), manifest):
+                    skip.add(str(file))
+            if skip:
+                logger.info(f"Skipping {len(skip)} unchanged files")
 
         processed_entries = []
-        for file in files:
-            try:
-                entry = self.process_file(str(file))
-                if 'error' not in entry:
-                    saved_path = self.save_entry(entry)
-                    entry['saved_path'] = saved_path
-                    processed_entries.append(entry)
-                    self.processed_files.append(str(file))
-                else:
-                    logger.error(f"Failed to process {file}: {entry['error']}")
-            except Exception as e:
-                logger.error(f"Error processing {file}: {e}")
+        for file, entry in self.iter_process_files(directory, workers, skip, write=True):
+            if 'error' not in entry:
+                processed_entries.append(entry)
+                self.processed_files.append(file)
+                manifest[str(Path(file).resolve())] = self._manifest_record(file)
+            else:
+                logger.error(f"Failed to process {file}: {entry['error']}")
+
+        self._save_manifest(manifest)
         return processed_entries
 
     # ---------- LOAD KNOWLEDGE ----------
-    def load_all_knowledge(self) -> Dict[str, Any]:
-        """Load all processed knowledge JSON files"""
-        knowledge_base = {k: [] for k in self.section_keywords.keys()}
-        json_files = list(self.knowledge_base_dir.glob("*_knowledge.json"))
+    def _passage_entries(self, data: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        (primary section, entry) passages of one saved or freshly processed
+        knowledge entry, each listing all its sections. Passages are cut from
+        the stored sentences at load time; files saved before sentences were
+        deduplicated are compacted on the fly. Entries returned by
+        ingest_file are read back from their saved file.
+        """
+        if 'sentences' not in data and 'saved_path' in data:
+            with open(data['saved_path'], 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        if 'sentences' not in data:
+            data = compact_entry(data)
+        section_names, sentences = data['section_names'], data['sentences']
+        passages = data.get('passages')
+        if passages is None:
+            passages = self.build_passages(data['file_name'], section_names, sentences)
+        body = sentence_body(sentences)
+        entries = []
+        for passage in passages:
+            sections = [section for section in passage['sections'] if section in self.section_keywords]
+            if sections:
+                section = passage['section'] if passage['section'] in sections else sections[0]
+                entries.append((section, {
+                    'id': passage['id'],
+                    'source': data['file_name'],
+                    'offset': passage['start'],
+                    'page': passage.get('page'),
+                    'sections': sections,
+                    'content': body[passage['start']:passage['end']]
+                }))
+        return entries
 
-        for json_file in json_files:
+    def compact_knowledge_files(self) -> List[str]:
+        """
+        Rewrite knowledge JSON files saved in the old per-section layout
+        (every sentence copied into each matching section, plus full_text)
+        into the deduplicated sentence layout. Returns the rewritten paths.
+        """
+        rewritten = []
+        for json_file in sorted(self.knowledge_base_dir.glob("*_knowledge.json")):
             try:
                 with open(json_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                for section, content in data.get('sections', {}).items():
-                    if content.strip() and section in knowledge_base:
-                        knowledge_base[section].append({
-                            'source': data['file_name'],
-                            'content': content.strip()
-                        })
+                if 'sentences' in data:
+                    continue
+                rewritten.append(self.save_entry(compact_entry(data)))
+            except Exception as e:
+                logger.error(f"Error compacting {json_file}: {e}")
+        return rewritten
+
+    def _segment(self, data: Dict[str, Any], section_terms: Dict[str, Dict[str, int]]) -> IndexSegment:
+        return IndexSegment(data['file_name'], self._passage_entries(data), section_terms)
+
+    def _source_files(self) -> List[Path]:
+        """
+        Every file the knowledge base is served from: processed
+        *_knowledge.json files plus raw PDFs and TXTs placed directly in the
+        knowledge base directory that have no processed file of their own.
+        """
+        sources = sorted(self.knowledge_base_dir.glob("*_knowledge.json"))
+        raw_files = list(self.knowledge_base_dir.glob("*.pdf")) + list(self.knowledge_base_dir.glob("*.txt"))
+        sources += sorted(path for path in raw_files if not self._output_path(path.name).exists())
+        return sources
+
+    def _segment_cache_key(self, path: Path, content: bytes) -> str:
+        """Hash of a source's name and content and of everything its segment is built with"""
+        digest = hashlib.sha256(content)
+        digest.update(f"{path.name}:{self.PROCESSOR_VERSION}:{self.SNAPSHOT_FORMAT}:{self._keywords_version()}"
+                      .encode('utf-8'))
+        return digest.hexdigest()
+
+    def _source_segment(self, path: Path, section_terms: Dict[str, Dict[str, int]]) -> Tuple[str, Union[IndexSegment, None]]:
+        """
+        (cache key, segment) of one source file. The segment comes from the
+        cache when one was built from identical content; otherwise JSON is
+        parsed, or a raw document is processed in memory, and the result is
+        indexed and cached. The segment is None for documents without text.
+        """
+        with open(path, 'rb') as f:
+            content = f.read()
+        key = self._segment_cache_key(path, content)
+        cache_path = self.knowledge_base_dir / self.SEGMENT_CACHE_DIR / f"{key}.pkl"
+        if cache_path.exists():
+            try:
+                with open(cache_path, 'rb') as f:
+                    return key, pickle.load(f)
             except Exception as e:
-                logger.error(f"Error loading {json_file}: {e}")
+                logger.warning(f"Ignoring unreadable cached segment {cache_path}: {e}")
+
+        if path.suffix.lower() == '.json':
+            data = json.loads(content)
+        else:
+            data = self.process_file(str(path))
+            if 'error' in data:
+                logger.warning(f"Skipping {path}: {data['error']}")
+                return key, None
+        segment = self._segment(data, section_terms)
+
+        try:
+            self._write_cached_segment(cache_path, segment)
+        except Exception as e:
+            logger.warning(f"Could not cache segment of {path} in {cache_path}: {e}")
+        return key, segment
+
+    @staticmethod
+    def _write_cached_segment(cache_path: Path, segment: IndexSegment) -> None:
+        """Pickle a segment through a temp file unique to this writer, so concurrent workers never collide"""
+        cache_path.parent.mkdir(exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(segment, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    def _load_segments(self, section_terms: Dict[str, Dict[str, int]]) -> List[IndexSegment]:
+        """
+        Index segments of every source file (see _source_files), reusing
+        cached segments of unchanged sources. Cached segments no source
+        refers to any more are removed.
+        """
+        segments, keys = [], set()
+        for path in self._source_files():
+            try:
+                key, segment = self._source_segment(path, section_terms)
+                keys.add(key)
+                if segment is not None:
+                    segments.append(segment)
+            except Exception as e:
+                logger.error(f"Error loading {path}: {e}")
+
+        cache_dir = self.knowledge_base_dir / self.SEGMENT_CACHE_DIR
+        for cache_file in cache_dir.glob("*.pkl"):
+            if cache_file.stem not in keys:
+                cache_file.unlink(missing_ok=True)
+        return segments
+
+    def load_all_knowledge(self, use_snapshot: bool = True) -> Dict[str, Any]:
+        """
+        Load the knowledge base with its search index. A current snapshot is
+        used when available; otherwise every source file is loaded as
+        passages and indexed, reusing the cached segments of sources whose
+        content has not changed.
+        """
+        if use_snapshot:
+            knowledge_base = self.load_snapshot()
+            if knowledge_base is not None:
+                return knowledge_base
+
+        section_terms = section_fields(self.section_keywords, self.section_keywords)
+        return KnowledgeBase.from_index(KnowledgeIndex(self._load_segments(section_terms), section_terms))
+
+    # ---------- SNAPSHOT ----------
+    def _snapshot_path(self) -> Path:
+        return self.knowledge_base_dir / self.SNAPSHOT_FILE
+
+    def _snapshot_fingerprint(self) -> Dict[str, Any]:
+        """Everything a snapshot depends on; any change makes it stale"""
+        files = []
+        for path in self._source_files():
+            stat = path.stat()
+            files.append([path.name, stat.st_size, stat.st_mtime_ns])
+        return {
+            'format': self.SNAPSHOT_FORMAT,
+            'processor_version': self.PROCESSOR_VERSION,
+            'keywords_version': self._keywords_version(),
+            'files': files
+        }
 
-        return knowledge_base
+    def build_snapshot(self) -> str:
+        """
+        Write the prebuilt index segments to one binary file and the passage
+        texts to a separate corpus file that is memory-mapped at load time,
+        so server start-up skips JSON parsing and tokenization and workers
+        share the passage text through the page cache.
+        """
+        section_terms = section_fields(self.section_keywords, self.section_keywords)
+        segments = self._load_segments(section_terms)
+
+        corpus_path = self.knowledge_base_dir / self.CORPUS_FILE
+        spans = iter(MappedCorpus.write(str(corpus_path), (entry['content']
+                                                           for segment in segments
+                                                           for _, entry in segment.entries)))
+        stored_segments = []
+        for segment in segments:
+            stored = copy.copy(segment)
+            stored.entries = [
+                (section, {**{k: v for k, v in entry.items() if k != 'content'}, 'span': next(spans)})
+                for section, entry in segment.entries
+            ]
+            stored_segments.append(stored)
+
+        snapshot = {
+            'fingerprint': self._snapshot_fingerprint(),
+            'corpus_size': corpus_path.stat().st_size,
+            'section_terms': section_terms,
+            'segments': stored_segments
+        }
+        path = self._snapshot_path()
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        logger.info(f"Saved knowledge snapshot: {path}")
+        return str(path)
+
+    def load_snapshot(self) -> Union[KnowledgeBase, None]:
+        """Knowledge base from the snapshot and mapped corpus, or None if missing or stale"""
+        path = self._snapshot_path()
+        corpus_path = self.knowledge_base_dir / self.CORPUS_FILE
+        if not path.exists() or not corpus_path.exists():
+            return None
+        try:
+            with open(path, 'rb') as f:
+                snapshot = pickle.load(f)
+            if snapshot.get('fingerprint') != self._snapshot_fingerprint():
+                logger.info(f"Snapshot {path} is stale, loading knowledge JSON instead")
+                return None
+            corpus = MappedCorpus(str(corpus_path))
+            if corpus.size != snapshot.get('corpus_size'):
+                logger.info(f"Corpus {corpus_path} does not match snapshot, loading knowledge JSON instead")
+                return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+            return None
+
+        for segment in snapshot['segments']:
+            segment.entries = [(section, CorpusEntry(corpus, entry.pop('span'), entry))
+                               for section, entry in segment.entries]
+        logger.info(f"Loaded knowledge snapshot: {path} (passages mapped from {corpus_path})")
+        return KnowledgeBase.from_index(KnowledgeIndex(snapshot['segments'], snapshot['section_terms']))
+
+    def update_knowledge(self,
+                         knowledge_base: Dict[str, Any],
+                         knowledge_entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Patch a loaded knowledge base with freshly processed entries: their
+        sources are re-indexed, every other source keeps its segment.
+        Returns a new knowledge base; the one passed in is left untouched.
+        """
+        index = getattr(knowledge_base, 'index', None)
+        if index is None:
+            return self.load_all_knowledge()
+        if not knowledge_entries:
+            return knowledge_base
+        segments = [self._segment(entry, index.section_terms) for entry in knowledge_entries]
+        return KnowledgeBase.from_index(index.replace_sources(segments))
 
     # ---------- ADVANCED SEARCH ----------
     def search_knowledge(self,
                          query: str,
                          knowledge_base: Dict[str, Any],
-                         min_score: float = 0.1) -> List[Dict[str, str]]:
+                         min_score: float = 0.1,
+                         top_k: Union[int, None] = None,
+                         language: Union[str, None] = None) -> List[Dict[str, str]]:
         """
-        Search knowledge base using ranked relevance:
-          - Token overlap
-          - Keyword match
-          - Partial/phrase match
+        Search knowledge base ranked by BM25F:
+          - Entry content as the main, length-normalized field
+          - Section (name + keywords) as a boosting field
+        Term statistics come from the index prebuilt by load_all_knowledge,
+        so results are already in final order.
+
+        :param top_k: keep only the k best entries (bounded heap); None returns all
+        :param language: request language code; the query is routed to that
+            language's index partition ('ml...' -> Malayalam, others ->
+            English), None searches every entry
         """
-        query_lower = query.lower()
-        query_tokens = set(query_lower.split())
+        index = self._index_of(knowledge_base)
+        return self._rank(index, index.score(query, language), min_score, top_k)
+
+    def search_knowledge_counted(self,
+                                 query: str,
+                                 knowledge_base: Dict[str, Any],
+                                 min_score: float = 0.1,
+                                 top_k: Union[int, None] = None,
+                                 language: Union[str, None] = None) -> Tuple[List[Dict[str, str]], int]:
+        """search_knowledge plus the number of entries scoring at least min_score, from one scoring pass"""
+        index = self._index_of(knowledge_base)
+        scores = index.score(query, language)
+        total = sum(1 for score in scores.values() if score >= min_score)
+        return self._rank(index, scores, min_score, top_k), total
+
+    def search_knowledge_batch(self,
+                               queries: List[str],
+                               knowledge_base: Dict[str, Any],
+                               min_score: float = 0.1,
+                               top_k: Union[int, None] = None,
+                               languages: Union[List[str], None] = None) -> List[List[Dict[str, str]]]:
+        """search_knowledge for several queries (and their languages), scored in one pass over the index"""
+        index = self._index_of(knowledge_base)
+        return [self._rank(index, scores, min_score, top_k) for scores in index.score_many(queries, languages)]
+
+    def _index_of(self, knowledge_base: Dict[str, Any]) -> KnowledgeIndex:
+        index = getattr(knowledge_base, 'index', None)
+        if index is None:
+            index = KnowledgeIndex.from_sections(knowledge_base, self.section_keywords)
+        return index
+
+    @staticmethod
+    def _rank(index: KnowledgeIndex, scores: Dict[int, float],
+              min_score: float, top_k: Union[int, None]) -> List[Dict[str, str]]:
+        """Result dicts of the best scoring entries, best first"""
+        scored = ((doc_id, score) for doc_id, score in scores.items() if score >= min_score)
+        # Highest score first, ties in index order
+        ranking_key = lambda item: (item[1], -item[0])
+        if top_k is None:
+            winners = sorted(scored, key=ranking_key, reverse=True)
+        else:
+            winners = heapq.nlargest(top_k, scored, key=ranking_key)
+
+        # Result dicts and snippets are only built for the winners
         results = []
+        for doc_id, total_score in winners:
+            section, entry = index.entries[doc_id]
+            results.append({
+                'id': entry.get('id'),
+                'section': section,
+                'source': entry['source'],
+                'page': entry.get('page'),
+                'score': round(total_score, 3),
+                'content': entry['content'][:500] + "..." if len(entry['content']) > 500 else entry['content']
+            })
+        return results
 
-        for section, entries in knowledge_base.items():
-            for entry in entries:
-                content_lower = entry['content'].lower()
 
-                # Exact phrase match gets bonus
-                phrase_score = 2.0 if query_lower in content_lower else 0.0
+# -----------------------------
+# Deduplicated sentence storage
+# -----------------------------
+def sentence_body(sentences: List[List[Union[str, int]]]) -> str:
+    """Document text passages are cut from: every kept sentence once, in order"""
+    return ''.join(sentence + ". " for sentence, *_ in sentences)
 
-                # Token overlap score
-                entry_tokens = set(content_lower.split())
-                overlap = len(query_tokens & entry_tokens)
-                overlap_score = overlap / max(len(query_tokens), 1)
 
-                # Partial match
-                partial_score = 1.0 if any(q in content_lower for q in query_tokens) else 0.0
+def section_views(section_names: List[str], sentences: List[List[Union[str, int]]]) -> Dict[str, str]:
+    """Per-section text rebuilt from sentence masks, as the old extract_sections produced it"""
+    views = {section: [] for section in section_names}
+    for sentence, mask, *_ in sentences:
+        for bit, section in enumerate(section_names):
+            if mask >> bit & 1:
+                views[section].append(sentence + ". ")
+    return {section: ''.join(parts) for section, parts in views.items()}
 
-                total_score = phrase_score + overlap_score + partial_score
 
-                if total_score >= min_score:
-                    results.append({
-                        'section': section,
-                        'source': entry['source'],
-                        'score': round(total_score, 3),
-                        'content': entry['content'][:500] + "..." if len(entry['content']) > 500 else entry['content']
-                    })
+def compact_entry(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Knowledge entry in the old per-section layout converted to deduplicated
+    sentences with section masks. Each section holds its sentences in
+    document order, so a sentence first seen in a later section is placed
+    right after its predecessor in that section.
+    """
+    section_names = list(data.get('sections', {}))
+    following: Dict[str, Union[str, None]] = {'': None}
+    masks: Dict[str, int] = {}
+    for bit, section in enumerate(section_names):
+        previous = ''
+        for sentence in data['sections'][section].split('. '):
+            if not sentence:
+                continue
+            if sentence not in masks:
+                masks[sentence] = 0
+                following[sentence] = following[previous]
+                following[previous] = sentence
+            masks[sentence] |= 1 << bit
+            previous = sentence
 
-        # Sort results by score descending
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return results
+    sentences, sentence = [], following['']
+    while sentence is not None:
+        sentences.append([sentence, masks[sentence]])
+        sentence = following[sentence]
+    compact = {key: value for key, value in data.items() if key not in ('sections', 'passages', 'full_text')}
+    compact['section_names'] = section_names
+    compact['sentences'] = sentences
+    return compact
+
+
+# -----------------------------
+# Process pool worker
+# -----------------------------
+_worker_processors: Dict[Tuple[str, str], AgriculturalDocumentProcessor] = {}
+
+
+def _process_file_in_worker(config: Tuple[str, str], file_path: str, write: bool = False) -> Dict[str, Any]:
+    """Run process_file (or ingest_file when writing) in a pool worker, reusing one processor per config"""
+    processor = _worker_processors.get(config)
+    if processor is None:
+        # Pool workers cannot start pools of their own, so pages stay serial here
+        processor = _worker_processors[config] = AgriculturalDocumentProcessor(*config, page_workers=1)
+    return processor.ingest_file(file_path) if write else processor.process_file(file_path)
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[str]:
+    """Extract pages [start, end) of a PDF in a pool worker"""
+    with fitz.open(pdf_path) as doc:
+        return [doc[i].get_text() for i in range(start, end)]
 
 
 # -----------------------------
@@ -255,7 +1030,22 @@ AgriculturalPDFProcessor = AgriculturalDocumentProcessor
 
 def main():
     """Example usage"""
+    parser = argparse.ArgumentParser(description="Process agricultural documents into the knowledge base")
+    parser.add_argument('--build-snapshot', action='store_true',
+                        help="only write the prebuilt knowledge snapshot used for fast start-up")
+    parser.add_argument('--compact', action='store_true',
+                        help="only rewrite old per-section knowledge JSON files as deduplicated sentences")
+    args = parser.parse_args()
+
     processor = AgriculturalDocumentProcessor()
+
+    if args.compact:
+        print(f"Compacted {len(processor.compact_knowledge_files())} knowledge files")
+        return
+
+    if args.build_snapshot:
+        print(f"Snapshot written to {processor.build_snapshot()}")
+        return
     
     # Process files
     processed_entries = processor.process_multiple_files("agricultural_pdfs")
@@ -263,11 +1053,11 @@ def main():
     
     # Load knowledge
     knowledge_base = processor.load_all_knowledge()
-    total_entries = sum(len(entries) for entries in knowledge_base.values())
+    total_entries = knowledge_base.entry_count()
     print(f"Loaded {total_entries} knowledge entries")
     
     # Search
-    results = processor.search_knowledge("coconut cultivation", knowledge_base)
+    results = processor.search_knowledge("coconut cultivation", knowledge_base, top_k=3)
     print(f"Found {len(results)} relevant entries")
     for result in results[:3]:
         print(f"Score: {result['score']} | Section: {result['section']} | Source: {result['source']}")